@@ -7,22 +7,46 @@ about the expected behavior of the program.
 """
 
 import csv
+import glob
+import hashlib
+import heapq
+import io
+import json
+import locale
+import marshal
+import multiprocessing
+import os
+import sys
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 ##
 ## Provided code from Week 3 Project
 ##
 
-def read_csv_as_list_dict(filename, separator, quote):
+def read_csv_as_list_dict(filename, separator, quote, cachedir=None):
     """
     Inputs:
       filename  - name of CSV file
       separator - character that separates fields
       quote     - character used to optionally quote fields
+      cachedir  - optional directory for the binary table cache
     Output:
       Returns a list of dictionaries where each item in the list
       corresponds to a row in the CSV file.  The dictionaries in the
       list map the field names to the field values for that row.
     """
+    if cachedir:
+        fieldnames, rows = read_csv_rows_cached(filename, separator, quote, cachedir)
+        return list(_cached_row_dicts(fieldnames, rows))
+
     table = []
     with open(filename, newline='') as csvfile:
         csvreader = csv.DictReader(csvfile, delimiter=separator, quotechar=quote)
@@ -31,19 +55,24 @@ def read_csv_as_list_dict(filename, separator, quote):
     return table
 
 
-def read_csv_as_nested_dict(filename, keyfield, separator, quote):
+def read_csv_as_nested_dict(filename, keyfield, separator, quote, cachedir=None):
     """
     Inputs:
       filename  - name of CSV file
       keyfield  - field to use as key for rows
       separator - character that separates fields
       quote     - character used to optionally quote fields
+      cachedir  - optional directory for the binary table cache
     Output:
       Returns a dictionary of dictionaries where the outer dictionary
       maps the value in the key_field to the corresponding row in the
       CSV file.  The inner dictionaries map the field names to the
       field values for that row.
     """
+    if cachedir:
+        fieldnames, rows = read_csv_rows_cached(filename, separator, quote, cachedir)
+        return {row[keyfield]: row for row in _cached_row_dicts(fieldnames, rows)}
+
     table = {}
     with open(filename, newline='') as csvfile:
         csvreader = csv.DictReader(csvfile, delimiter=separator, quotechar=quote)
@@ -52,6 +81,341 @@ def read_csv_as_nested_dict(filename, keyfield, separator, quote):
             table[rowid] = row
     return table
 
+
+# Separates the values of a column in the table cache
+_CACHE_SEPARATOR = "\x00"
+
+
+def _csv_cache_path(cachedir, filename, separator, quote):
+    """
+    Inputs:
+      cachedir  - Directory holding the cached tables
+      filename  - Name of CSV file
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+    Output:
+      Returns a tuple of the name of the cache file for the current
+      contents of filename and the prefix shared by all cache files
+      for that path, separator and quote.
+    """
+    path = os.path.abspath(filename)
+    status = os.stat(path)
+    key = repr((path, status.st_size, status.st_mtime_ns, separator, quote))
+    dialect = repr((path, separator, quote))
+    prefix = os.path.join(cachedir, "{}-{}-".format(
+        os.path.basename(path), hashlib.sha1(dialect.encode()).hexdigest()[:12]))
+    return prefix + hashlib.sha1(key.encode()).hexdigest() + ".cache", prefix
+
+
+def read_csv_rows_cached(filename, separator, quote, cachedir):
+    """
+    Inputs:
+      filename  - Name of CSV file
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+      cachedir  - Directory holding the cached tables
+    Output:
+      Returns a tuple of the list of field names and the list of
+      rows (tuples of strings) in the CSV file, the same rows (blank
+      ones included) that csv.reader would return.
+
+      The parsed table is stored in a binary cache file the first
+      time it is read.  The cache is keyed by the file path, size,
+      modification time, separator and quote character, so any change
+      to the file (or to the dialect) causes it to be parsed again.
+    """
+    cachepath, prefix = _csv_cache_path(cachedir, filename, separator, quote)
+    try:
+        with open(cachepath, 'rb') as cachefile:
+            fieldnames, columns, rows = marshal.load(cachefile)
+        if columns is not None:
+            # Split each column back into its values and rebuild the rows
+            rows = list(zip(*[column.split(_CACHE_SEPARATOR) for column in columns]))
+        return fieldnames, rows
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with open(filename, newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        fieldnames = next(csvreader, [])
+        rows = [tuple(row) for row in csvreader]
+
+    # Store the table column by column, each column as a single string,
+    # unless the table is empty, ragged or contains the column separator
+    columns = None
+    if rows and all(len(row) == len(fieldnames) for row in rows):
+        columns = [_CACHE_SEPARATOR.join(column) for column in zip(*rows)]
+        if len(columns) != len(fieldnames) or any(
+                column.count(_CACHE_SEPARATOR) != len(rows) - 1 for column in columns):
+            columns = None
+
+    # Replace any stale cache for this file and dialect, writing the new
+    # one atomically
+    os.makedirs(cachedir, exist_ok=True)
+    for stalepath in glob.glob(glob.escape(prefix) + "*.cache"):
+        try:
+            os.remove(stalepath)
+        except OSError:
+            pass
+    temppath = "{}.{}.tmp".format(cachepath, os.getpid())
+    with open(temppath, 'wb') as cachefile:
+        marshal.dump((fieldnames, columns, None if columns else rows), cachefile)
+    os.replace(temppath, cachepath)
+    return fieldnames, rows
+
+def _cached_row_dicts(fieldnames, rows):
+    """
+    Inputs:
+      fieldnames - List of field names
+      rows       - Iterable of rows read from the table cache
+    Output:
+      Generates the same dictionaries that csv.DictReader would for
+      the given rows: blank rows are skipped, missing fields are None
+      and extra values are listed under the key None.
+    """
+    numfields = len(fieldnames)
+    for row in rows:
+        if not row:
+            continue
+        rowdict = dict(zip(fieldnames, row))
+        if len(row) > numfields:
+            rowdict[None] = list(row[numfields:])
+        for field in fieldnames[len(row):]:
+            rowdict[field] = None
+        yield rowdict
+
+##
+## Columnar batting table shared across queries
+##
+
+class BattingTable:
+    """
+    Batting statistics loaded once from the batting file described by
+    a baseball data information dictionary.
+
+    The year and the batting fields are stored as typed integer
+    columns (one array per field), with 0 in place of empty values
+    and the offsets of the rows where they were empty kept in nulls.
+    The player IDs are interned.  The same table can therefore be
+    queried many times without re-reading or re-converting the CSV
+    file.  Row offsets are also indexed by year so that a single
+    season can be selected without scanning the whole table.
+    """
+
+    def __init__(self, info):
+        """
+        Inputs:
+          info - Baseball data information dictionary
+        """
+        self.playerid = info['playerid']
+        self.yearid = info['yearid']
+        self.fields = [self.yearid] + list(info['battingfields'])
+        self.playerids = []
+        self.columns = {field: array('q') for field in self.fields}
+        self.nulls = {}
+        self._player_codes = None
+
+        if info.get('cachedir'):
+            header, rows = read_csv_rows_cached(info['battingfile'], info['separator'],
+                                                info['quote'], info['cachedir'])
+            self._load_rows(header, rows)
+        else:
+            with open(info['battingfile'], newline='') as csvfile:
+                csvreader = csv.reader(csvfile, delimiter=info['separator'],
+                                       quotechar=info['quote'])
+                self._load_rows(next(csvreader), csvreader)
+
+        # Index the row offsets by year
+        self.year_index = {}
+        for index, year in enumerate(self.columns[self.yearid]):
+            if year not in self.year_index:
+                self.year_index[year] = array('q')
+            self.year_index[year].append(index)
+
+    def _load_rows(self, header, rows):
+        """
+        Inputs:
+          header - List of field names in the batting file
+          rows   - Iterable of rows (lists of strings) to load
+        """
+        playerindex = header.index(self.playerid)
+        fieldcolumns = [(header.index(field), field, self.columns[field])
+                        for field in self.fields]
+        nulls = self.nulls
+        for row in rows:
+            if not row:
+                # Skip blank lines, as csv.DictReader does
+                continue
+            self.playerids.append(sys.intern(row[playerindex]))
+            for index, field, column in fieldcolumns:
+                value = row[index]
+                if value:
+                    column.append(int(value))
+                else:
+                    nulls.setdefault(field, set()).add(len(column))
+                    column.append(0)
+
+    def __len__(self):
+        return len(self.playerids)
+
+    def row(self, index):
+        """
+        Inputs:
+          index - Row offset in the table
+        Output:
+          Returns a batting statistics dictionary for the given row
+          that maps the player ID field and the loaded fields to their
+          (integer) values, with None for empty values as in
+          read_csv_as_typed_list_dict.
+        """
+        stats = {field: self.columns[field][index] for field in self.fields}
+        for field, rows in self.nulls.items():
+            if index in rows:
+                stats[field] = None
+        stats[self.playerid] = self.playerids[index]
+        return stats
+
+    def rows(self, indexes=None):
+        """
+        Inputs:
+          indexes - Optional iterable of row offsets (defaults to all rows)
+        Output:
+          Generates the batting statistics dictionaries for the given rows.
+        """
+        if indexes is None:
+            indexes = range(len(self))
+        for index in indexes:
+            yield self.row(index)
+
+    def rows_for_year(self, year):
+        """
+        Inputs:
+          year - Year to select
+        Output:
+          Generates the batting statistics dictionaries for the rows
+          from the given year using the year index.
+        """
+        return self.rows(self.year_index.get(year, ()))
+
+    def column_array(self, field):
+        """
+        Inputs:
+          field - Name of a loaded field
+        Output:
+          Returns a NumPy integer array viewing the column for the
+          given field (without copying it).  Empty values are 0, as
+          the batting formulas count them.
+        """
+        return numpy.frombuffer(self.columns[field], dtype=numpy.int64)
+
+    def player_codes(self):
+        """
+        Output:
+          Returns a tuple of the list of distinct player IDs, in order
+          of first appearance, and an integer array that maps each row
+          to the position of its player ID in that list.
+        """
+        if self._player_codes is None:
+            players = {}
+            codes = array('q')
+            for player_id in self.playerids:
+                if player_id not in players:
+                    players[player_id] = len(players)
+                codes.append(players[player_id])
+            self._player_codes = (list(players), codes)
+        return self._player_codes
+
+##
+## Player names shared across queries
+##
+
+class PlayerDirectory:
+    """
+    First and last names of the players in the master file described
+    by a baseball data information dictionary.
+
+    Only the player ID and name columns are kept, as interned strings.
+    The master file is read the first time a name is looked up (or
+    when load is called).
+    """
+
+    __slots__ = ('info', '_names')
+
+    def __init__(self, info):
+        """
+        Inputs:
+          info - Baseball data information dictionary
+        """
+        self.info = info
+        self._names = None
+
+    def load(self):
+        """
+        Reads the master file if it has not been read yet.
+        """
+        if self._names is not None:
+            return
+        info = self.info
+        if info.get('cachedir'):
+            header, rows = read_csv_rows_cached(info['masterfile'], info['separator'],
+                                                info['quote'], info['cachedir'])
+            self._load_rows(header, rows)
+        else:
+            with open(info['masterfile'], newline='') as csvfile:
+                csvreader = csv.reader(csvfile, delimiter=info['separator'],
+                                       quotechar=info['quote'])
+                self._load_rows(next(csvreader), csvreader)
+
+    def _load_rows(self, header, rows):
+        """
+        Inputs:
+          header - List of field names in the master file
+          rows   - Iterable of rows (lists of strings) to load
+        """
+        playerindex = header.index(self.info['playerid'])
+        firstindex = header.index(self.info['firstname'])
+        lastindex = header.index(self.info['lastname'])
+        names = {}
+        for row in rows:
+            if not row:
+                continue
+            names[sys.intern(row[playerindex])] = (sys.intern(row[firstindex]),
+                                                   sys.intern(row[lastindex]))
+        self._names = names
+
+    def name(self, player_id):
+        """
+        Inputs:
+          player_id - Player ID to look up
+        Output:
+          Returns a tuple of the first and last name of the player.
+        """
+        if self._names is None:
+            self.load()
+        return self._names[player_id]
+
+
+# Player directories shared across calls, keyed by master file and format
+_PLAYER_DIRECTORIES = {}
+
+def get_player_directory(info):
+    """
+    Inputs:
+      info - Baseball data information dictionary
+    Output:
+      Returns the PlayerDirectory shared by all calls with the same
+      master file (as of its current modification time) and format.
+    """
+    masterfile = os.path.abspath(info['masterfile'])
+    key = (masterfile, os.stat(masterfile).st_mtime_ns, info['separator'],
+           info['quote'], info['playerid'], info['firstname'], info['lastname'])
+    if key not in _PLAYER_DIRECTORIES:
+        # Drop directories for older versions of the same master file
+        for stale in [stale for stale in _PLAYER_DIRECTORIES if stale[0] == masterfile]:
+            del _PLAYER_DIRECTORIES[stale]
+        _PLAYER_DIRECTORIES[key] = PlayerDirectory(info)
+    return _PLAYER_DIRECTORIES[key]
+
 ##
 ## Provided formulas for common batting statistics
 ##
@@ -62,12 +426,13 @@ MINIMUM_AB = 500
 def batting_average(info, batting_stats):
     """
     Inputs:
-      batting_stats - dictionary of batting statistics (values are strings)
+      batting_stats - dictionary of batting statistics (values are strings
+                      or numbers; empty values and None count as 0)
     Output:
       Returns the batting average as a float
     """
-    hits = float(batting_stats[info["hits"]])
-    at_bats = float(batting_stats[info["atbats"]])
+    hits = float(batting_stats[info["hits"]] or 0)
+    at_bats = float(batting_stats[info["atbats"]] or 0)
     if at_bats >= MINIMUM_AB:
         return hits / at_bats
     else:
@@ -76,13 +441,14 @@ def batting_average(info, batting_stats):
 def onbase_percentage(info, batting_stats):
     """
     Inputs:
-      batting_stats - dictionary of batting statistics (values are strings)
+      batting_stats - dictionary of batting statistics (values are strings
+                      or numbers; empty values and None count as 0)
     Output:
       Returns the on-base percentage as a float
     """
-    hits = float(batting_stats[info["hits"]])
-    at_bats = float(batting_stats[info["atbats"]])
-    walks = float(batting_stats[info["walks"]])
+    hits = float(batting_stats[info["hits"]] or 0)
+    at_bats = float(batting_stats[info["atbats"]] or 0)
+    walks = float(batting_stats[info["walks"]] or 0)
     if at_bats >= MINIMUM_AB:
         return (hits + walks) / (at_bats + walks)
     else:
@@ -91,22 +457,159 @@ def onbase_percentage(info, batting_stats):
 def slugging_percentage(info, batting_stats):
     """
     Inputs:
-      batting_stats - dictionary of batting statistics (values are strings)
+      batting_stats - dictionary of batting statistics (values are strings
+                      or numbers; empty values and None count as 0)
     Output:
       Returns the slugging percentage as a float
     """
-    hits = float(batting_stats[info["hits"]])
-    doubles = float(batting_stats[info["doubles"]])
-    triples = float(batting_stats[info["triples"]])
-    home_runs = float(batting_stats[info["homeruns"]])
+    hits = float(batting_stats[info["hits"]] or 0)
+    doubles = float(batting_stats[info["doubles"]] or 0)
+    triples = float(batting_stats[info["triples"]] or 0)
+    home_runs = float(batting_stats[info["homeruns"]] or 0)
     singles = hits - doubles - triples - home_runs
-    at_bats = float(batting_stats[info["atbats"]])
+    at_bats = float(batting_stats[info["atbats"]] or 0)
     if at_bats >= MINIMUM_AB:
         return (singles + 2 * doubles + 3 * triples + 4 * home_runs) / at_bats
     else:
         return 0
 
 
+##
+## Batch (NumPy) evaluation of the batting formulas
+##
+
+def _batch_ratio(numerator, denominator, at_bats):
+    """
+    Inputs:
+      numerator   - Float array of numerators
+      denominator - Float array of denominators
+      at_bats     - Float array of at bats
+    Output:
+      Returns numerator / denominator where at_bats meets the
+      MINIMUM_AB cutoff and 0 elsewhere.
+    """
+    result = numpy.zeros(len(at_bats))
+    numpy.divide(numerator, denominator, out=result, where=at_bats >= MINIMUM_AB)
+    return result
+
+
+def _batting_average_batch(info, columns):
+    """
+    Batch version of batting_average over a dictionary of float columns.
+    """
+    hits = columns[info["hits"]]
+    at_bats = columns[info["atbats"]]
+    return _batch_ratio(hits, at_bats, at_bats)
+
+
+def _onbase_percentage_batch(info, columns):
+    """
+    Batch version of onbase_percentage over a dictionary of float columns.
+    """
+    hits = columns[info["hits"]]
+    at_bats = columns[info["atbats"]]
+    walks = columns[info["walks"]]
+    return _batch_ratio(hits + walks, at_bats + walks, at_bats)
+
+
+def _slugging_percentage_batch(info, columns):
+    """
+    Batch version of slugging_percentage over a dictionary of float columns.
+    """
+    hits = columns[info["hits"]]
+    doubles = columns[info["doubles"]]
+    triples = columns[info["triples"]]
+    home_runs = columns[info["homeruns"]]
+    singles = hits - doubles - triples - home_runs
+    at_bats = columns[info["atbats"]]
+    return _batch_ratio(singles + 2 * doubles + 3 * triples + 4 * home_runs,
+                        at_bats, at_bats)
+
+
+# Maps formulas to their batch versions
+BATCH_FORMULAS = {batting_average: _batting_average_batch,
+                  onbase_percentage: _onbase_percentage_batch,
+                  slugging_percentage: _slugging_percentage_batch}
+
+
+def batch_formula(formula):
+    """
+    Inputs:
+      formula - Formula function
+    Output:
+      Returns the batch version of the formula from BATCH_FORMULAS, or
+      None if it has none.  Wrapped formulas (such as those replaced by
+      a profiler) are looked up through their __wrapped__ attribute.
+    """
+    while formula not in BATCH_FORMULAS:
+        formula = getattr(formula, '__wrapped__', None)
+        if formula is None:
+            return None
+    return BATCH_FORMULAS[formula]
+
+
+# Sums made by sum_formulas, keyed by the tuple of formulas added
+_FORMULA_SUMS = {}
+
+def sum_formulas(*formulas):
+    """
+    Inputs:
+      formulas - Formula functions to add together
+    Output:
+      Returns a formula function that computes the sum of the given
+      formulas (for example, onbase plus slugging percentage).  If all
+      of the given formulas have batch versions, so does the sum.
+      Calls with the same formulas return the same function.
+    """
+    if formulas in _FORMULA_SUMS:
+        return _FORMULA_SUMS[formulas]
+
+    def total(info, batting_stats):
+        return sum(formula(info, batting_stats) for formula in formulas)
+
+    batch_formulas = [batch_formula(formula) for formula in formulas]
+    if None not in batch_formulas:
+        def total_batch(info, columns):
+            result = numpy.zeros(len(next(iter(columns.values()))))
+            for formula in batch_formulas:
+                result = result + formula(info, columns)
+            return result
+        BATCH_FORMULAS[total] = total_batch
+
+    _FORMULA_SUMS[formulas] = total
+    return total
+
+
+def top_player_ids_batch(info, columns, player_ids, formula, numplayers):
+    """
+    Inputs:
+      info       - Baseball data information dictionary
+      columns    - Dictionary mapping the batting fields to float arrays
+      player_ids - List of player IDs corresponding to the array rows
+      formula    - Formula function with a batch version (see batch_formula)
+      numplayers - Number of top players to return
+    Outputs:
+      Returns the same list of tuples as top_player_ids, computing
+      the formula over whole columns at once.
+    """
+    values = batch_formula(formula)(info, columns)
+    # A stable sort keeps ties in input order, as top_player_ids does
+    order = numpy.argsort(-values, kind='stable')[:numplayers]
+    return [(player_ids[index], float(values[index])) for index in order]
+
+
+def can_batch(formula, batting):
+    """
+    Inputs:
+      formula - Formula function
+      batting - BattingTable or None
+    Output:
+      Returns True if the formula can be evaluated in batch mode
+      over the given table.
+    """
+    return numpy is not None and batting is not None and batch_formula(formula) is not None
+
+
 ##
 ## Part 1: Functions to compute top batting statistics by year
 ##
@@ -114,13 +617,18 @@ def slugging_percentage(info, batting_stats):
 def filter_by_year(statistics, year, yearid):
     """
     Inputs:
-      statistics - List of batting statistics dictionaries
+      statistics - List of batting statistics dictionaries or a
+                   BattingTable
       year       - Year to filter by
       yearid     - Year ID field in statistics
     Outputs:
       Returns a list of batting statistics dictionaries that
       are from the input year.
     """
+    if isinstance(statistics, BattingTable):
+        # Use the prebuilt year index instead of scanning every row
+        return list(statistics.rows_for_year(year))
+
     filtered_stats = [stat for stat in statistics if int(stat[yearid]) == year]
     return filtered_stats
 
@@ -129,7 +637,7 @@ def top_player_ids(info, statistics, formula, numplayers):
     """
     Inputs:
       info       - Baseball data information dictionary
-      statistics - List of batting statistics dictionaries
+      statistics - Iterable of batting statistics dictionaries
       formula    - function that takes an info dictionary and a
                    batting statistics dictionary as input and
                    computes a compound statistic
@@ -139,54 +647,48 @@ def top_player_ids(info, statistics, formula, numplayers):
       computed by formula, of the top numplayers players sorted in
       decreasing order of the computed statistic.
     """
-    # Compute the compound statistic for each player
-    player_stats = []
-    for stat in statistics:
-        player_id = stat[info["playerid"]]
-        stat_value = formula(info, stat)
-        player_stats.append((player_id, stat_value))
-    
-    # Sort the player statistics in descending order of the computed statistic
-    player_stats.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return the top numplayers
-    return player_stats[:numplayers]
+    # Compute the compound statistic for each player lazily
+    playerid = info["playerid"]
+    player_stats = ((stat[playerid], formula(info, stat)) for stat in statistics)
+
+    # Keep only the top numplayers in a bounded heap.  Ties keep their
+    # input order, exactly as a stable descending sort would.
+    return heapq.nlargest(numplayers, player_stats, key=itemgetter(1))
 
 
 
-def lookup_player_names(info, top_ids_and_stats):
+def lookup_player_names(info, top_ids_and_stats, directory=None):
     """
     Inputs:
       info              - Baseball data information dictionary
       top_ids_and_stats - list of tuples containing player IDs and
                           computed statistics
+      directory         - Optional PlayerDirectory to look the names up
+                          in (defaults to the one shared for info)
     Outputs:
       List of strings of the form "x.xxx --- FirstName LastName",
       where "x.xxx" is a string conversion of the float stat in
       the input and "FirstName LastName" is the name of the player
       corresponding to the player ID in the input.
     """
-    # Read the player master file
-    master_data = read_csv_as_list_dict(info['masterfile'], info['separator'], info['quote'])
-    
-    # Build dictionaries for player first and last names
-    player_first_name = {row[info['playerid']]: row[info['firstname']] for row in master_data}
-    player_last_name = {row[info['playerid']]: row[info['lastname']] for row in master_data}
+    # Get the (shared) directory of player names
+    if directory is None:
+        directory = get_player_directory(info)
     
     # Build the list of formatted player names and stats
     player_names = []
     
     for player_id, stat in top_ids_and_stats:
         formatted_stat = f"{stat:.3f}"
-        first_name = player_first_name[player_id]
-        last_name = player_last_name[player_id]
+        first_name, last_name = directory.name(player_id)
         player_names.append(f"{formatted_stat} --- {first_name} {last_name}")
     
     return player_names
 
 
 
-def compute_top_stats_year(info, formula, numplayers, year):
+def compute_top_stats_year(info, formula, numplayers, year, batting=None,
+                           vectorized=False):
     """
     Inputs:
       info        - Baseball data information dictionary
@@ -195,12 +697,31 @@ def compute_top_stats_year(info, formula, numplayers, year):
                     computes a compound statistic
       numplayers  - Number of top players to return
       year        - Year to filter by
+      batting     - Optional BattingTable to use instead of reading
+                    the batting file named in info
+      vectorized  - If True, evaluate the formula over whole columns
+                    with NumPy when possible (requires batting)
     Outputs:
       Returns a list of strings for the top numplayers in the given year
       according to the given formula.
     """
+    if vectorized and can_batch(formula, batting):
+        # Evaluate the formula over the year's rows all at once
+        indexes = numpy.frombuffer(batting.year_index.get(year, array('q')),
+                                   dtype=numpy.int64)
+        columns = {field: batting.column_array(field)[indexes].astype(float)
+                   for field in info['battingfields']}
+        player_ids = [batting.playerids[index] for index in indexes]
+        top_ids_and_stats = top_player_ids_batch(info, columns, player_ids,
+                                                 formula, numplayers)
+        return lookup_player_names(info, top_ids_and_stats)
+
     # Read the batting data
-    batting_data = read_csv_as_list_dict(info['battingfile'], info['separator'], info['quote'])
+    if batting is None:
+        batting_data = read_csv_as_list_dict(info['battingfile'], info['separator'], info['quote'],
+                                             info.get('cachedir'))
+    else:
+        batting_data = batting
     
     # Filter the data for the given year
     filtered_data = filter_by_year(batting_data, year, info['yearid'])
@@ -230,24 +751,239 @@ def aggregate_by_player_id(statistics, playerid, fields):
       are dictionaries of aggregated stats.  Only the fields from the fields
       input will be aggregated in the aggregated stats dictionaries.
     """
-    aggregated_stats = {}
+    career = CareerStats(playerid, fields)
+    career.add_rows(statistics)
+    return career.totals
 
-    for stat in statistics:
-        player_id = stat[playerid]
 
-        if player_id not in aggregated_stats:
-            # Initialize the player's aggregated stats dictionary
-            aggregated_stats[player_id] = {field: 0 for field in fields}
-            aggregated_stats[player_id][playerid] = player_id
-        
-        for field in fields:
-            aggregated_stats[player_id][field] += int(stat[field])
-    
-    return aggregated_stats
+class CareerStats:
+    """
+    Career totals for each player that can be updated incrementally.
+
+    New batting rows are applied as deltas to the running totals, the
+    rows appended to a batting file since the last update can be read
+    on their own, and the whole state can be saved to and loaded from
+    a JSON file between runs.
+
+    The totals read from each batting file are also kept apart, so
+    that a file that has been edited can be read again without
+    touching the rows from other files or those added by hand.
+    """
+
+    def __init__(self, playerid, fields):
+        """
+        Inputs:
+          playerid - Player ID field name
+          fields   - List of fields to aggregate
+        """
+        self.playerid = playerid
+        self.fields = list(fields)
+        self.totals = {}
+        self.counts = {}
+        self.headers = {}
+        self.offsets = {}
+        self.fingerprints = {}
+        self.stamps = {}
+        self.file_totals = {}
+
+    def add_rows(self, statistics, sign=1):
+        """
+        Inputs:
+          statistics - Iterable of batting statistics dictionaries
+          sign       - 1 to add the rows to the totals, -1 to remove them
+        """
+        playerid = self.playerid
+        fields = self.fields
+        totals = self.totals
+        counts = self.counts
+        for stat in statistics:
+            player_id = stat[playerid]
+            player_totals = totals.get(player_id)
+            if player_totals is None:
+                # Initialize the player's aggregated stats dictionary
+                player_totals = {field: 0 for field in fields}
+                player_totals[playerid] = player_id
+                totals[player_id] = player_totals
+            for field in fields:
+                player_totals[field] += sign * int(stat[field] or 0)
+            counts[player_id] = counts.get(player_id, 0) + sign
+            if not counts[player_id]:
+                # The player has no rows left
+                del totals[player_id]
+                del counts[player_id]
+
+    def remove_rows(self, statistics):
+        """
+        Inputs:
+          statistics - Iterable of batting statistics dictionaries
+                       previously added to the totals
+        """
+        self.add_rows(statistics, -1)
+
+    def _remove_file(self, filename):
+        """
+        Inputs:
+          filename - Absolute name of a batting file read by
+                     update_from_file
+        Output:
+          Takes the rows read from the file back out of the totals and
+          forgets how far the file was read.
+        """
+        for player_id, (count, *values) in self.file_totals.pop(filename, {}).items():
+            player_totals = self.totals.get(player_id)
+            if player_totals is None:
+                continue
+            for field, value in zip(self.fields, values):
+                player_totals[field] -= value
+            self.counts[player_id] = self.counts.get(player_id, 0) - count
+            if not self.counts[player_id]:
+                del self.totals[player_id]
+                del self.counts[player_id]
+        for state in (self.headers, self.offsets, self.fingerprints, self.stamps):
+            state.pop(filename, None)
+
+    def update_from_file(self, info):
+        """
+        Inputs:
+          info - Baseball data information dictionary
+        Output:
+          Returns the number of rows applied.
+
+          Only the complete records appended to the batting file since
+          the last update are parsed.  The part of the file that was
+          already read is checked against a hash saved by the last
+          update, so unless the file's size and modification time are
+          unchanged (when nothing is read at all) every update still
+          reads the whole file once.  If that part has changed (or the
+          file is now shorter), the rows from this file are taken out
+          of the totals and the file is read again from the start.
+        """
+        filename = os.path.abspath(info['battingfile'])
+        stat = os.stat(filename)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        if self.stamps.get(filename) == stamp:
+            return 0
+
+        offset = self.offsets.get(filename, 0)
+        digest = hashlib.sha1()
+        with open(filename, 'rb') as datafile:
+            if offset and not self._prefix_matches(datafile, offset, digest,
+                                                   self.fingerprints.get(filename)):
+                self._remove_file(filename)
+                offset = 0
+                digest = hashlib.sha1()
+            datafile.seek(offset)
+            data = datafile.read()
 
+        # Decode as open() would, and stop after the last record that
+        # is known to be complete: one that csv.reader ended at a line
+        # break without having to look for more lines
+        encoding = locale.getpreferredencoding(False)
+        complete = max(data.rfind(b'\n'), data.rfind(b'\r')) + 1
+        position = [0, False]
 
+        def lines():
+            for line in data[:complete].splitlines(keepends=True):
+                position[0] += len(line)
+                yield line.decode(encoding)
+            position[1] = True
 
-def compute_top_stats_career(info, formula, numplayers):
+        csvreader = csv.reader(lines(), delimiter=info['separator'], quotechar=info['quote'])
+        header = self.headers.get(filename)
+        rows = []
+        end = 0
+        for row in csvreader:
+            if position[1]:
+                # The last record runs past the data read so far
+                break
+            end = position[0]
+            if not row:
+                continue
+            if header is None:
+                header = row
+            else:
+                rows.append(dict(zip(header, row)))
+        digest.update(data[:end])
+
+        self.add_rows(rows)
+        contribution = self.file_totals.setdefault(filename, {})
+        for row in rows:
+            entry = contribution.get(row[self.playerid])
+            if entry is None:
+                entry = contribution[row[self.playerid]] = [0] * (len(self.fields) + 1)
+            entry[0] += 1
+            for index, field in enumerate(self.fields, 1):
+                entry[index] += int(row[field] or 0)
+        if header is not None:
+            self.headers[filename] = header
+        self.offsets[filename] = offset + end
+        self.fingerprints[filename] = digest.hexdigest()
+        self.stamps[filename] = stamp
+        return len(rows)
+
+    @staticmethod
+    def _prefix_matches(datafile, offset, digest, fingerprint):
+        """
+        Inputs:
+          datafile    - Batting file opened in binary mode
+          offset      - Number of bytes read by the last update
+          digest      - hashlib object to feed the first offset bytes to
+          fingerprint - Hex digest of those bytes saved by the last
+                        update, or None
+        Output:
+          Returns True if the first offset bytes of the file still end
+          with a line break and hash to fingerprint.
+        """
+        remaining = offset
+        last = b''
+        while remaining:
+            block = datafile.read(min(remaining, 1 << 20))
+            if not block:
+                return False
+            digest.update(block)
+            remaining -= len(block)
+            last = block[-1:]
+        return last in (b'\n', b'\r') and digest.hexdigest() == fingerprint
+
+    def save(self, filename):
+        """
+        Inputs:
+          filename - Name of JSON file to write the state to
+        """
+        state = {"playerid": self.playerid,
+                 "fields": self.fields,
+                 "totals": self.totals,
+                 "counts": self.counts,
+                 "headers": self.headers,
+                 "offsets": self.offsets,
+                 "fingerprints": self.fingerprints,
+                 "stamps": self.stamps,
+                 "file_totals": self.file_totals}
+        temppath = "{}.{}.tmp".format(filename, os.getpid())
+        with open(temppath, 'w') as statefile:
+            json.dump(state, statefile)
+        os.replace(temppath, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Inputs:
+          filename - Name of JSON file written by save
+        Output:
+          Returns the CareerStats stored in the file.
+        """
+        with open(filename) as statefile:
+            state = json.load(statefile)
+        career = cls(state["playerid"], state["fields"])
+        for name in ("totals", "counts", "headers", "offsets", "fingerprints",
+                     "stamps", "file_totals"):
+            setattr(career, name, state[name])
+        return career
+
+
+
+def compute_top_stats_career(info, formula, numplayers, batting=None,
+                             vectorized=False, career=None):
     """
     Inputs:
       info        - Baseball data information dictionary
@@ -255,12 +991,38 @@ def compute_top_stats_career(info, formula, numplayers):
                     batting statistics dictionary as input and
                     computes a compound statistic
       numplayers  - Number of top players to return
+      batting     - Optional BattingTable to use instead of reading
+                    the batting file named in info
+      vectorized  - If True, aggregate and evaluate the formula over
+                    whole columns with NumPy when possible (requires
+                    batting)
+      career      - Optional CareerStats holding up-to-date career
+                    totals, used instead of aggregating the batting data
     Outputs:
       Returns a list of strings for the top numplayers in the given year
       according to the given formula.
     """
+    if career is not None:
+        top_ids_and_stats = top_player_ids(info, career.totals.values(), formula, numplayers)
+        return lookup_player_names(info, top_ids_and_stats)
+
+    if vectorized and can_batch(formula, batting):
+        # Sum each field per player, in order of first appearance
+        player_ids, codes = batting.player_codes()
+        codes = numpy.frombuffer(codes, dtype=numpy.int64)
+        columns = {field: numpy.bincount(codes, weights=batting.column_array(field),
+                                         minlength=len(player_ids))
+                   for field in info['battingfields']}
+        top_ids_and_stats = top_player_ids_batch(info, columns, player_ids,
+                                                 formula, numplayers)
+        return lookup_player_names(info, top_ids_and_stats)
+
     # Read the batting data
-    batting_data = read_csv_as_list_dict(info['battingfile'], info['separator'], info['quote'])
+    if batting is None:
+        batting_data = read_csv_as_list_dict(info['battingfile'], info['separator'], info['quote'],
+                                             info.get('cachedir'))
+    else:
+        batting_data = batting.rows()
     
     # Aggregate the data by player ID
     aggregated_data = aggregate_by_player_id(batting_data, info['playerid'], info['battingfields'])
@@ -279,6 +1041,160 @@ def compute_top_stats_career(info, formula, numplayers):
 
 
 ##
+## Part 3: Running many queries at once
+##
+
+# Loaded data for _run_batch_query, set by compute_top_stats_batch
+_BATCH_STATE = None
+
+def _run_batch_query(index):
+    """
+    Inputs:
+      index - Position of the query in the batch
+    Output:
+      Returns the list of strings for the query at the given index.
+    """
+    info, batting, career, queries, vectorized = _BATCH_STATE
+    formula, numplayers, year = queries[index]
+    if year is not None:
+        return compute_top_stats_year(info, formula, numplayers, year,
+                                      batting, vectorized)
+    if vectorized and can_batch(formula, batting):
+        return compute_top_stats_career(info, formula, numplayers, batting, True)
+    return compute_top_stats_career(info, formula, numplayers, career=career)
+
+
+def compute_top_stats_batch(info, queries, processes=None, vectorized=False):
+    """
+    Inputs:
+      info        - Baseball data information dictionary
+      queries     - List of (formula, numplayers, year) tuples, where
+                    year is None for a career query
+      processes   - Number of worker processes (defaults to the
+                    number of CPUs)
+      vectorized  - If True, evaluate the formulas with NumPy when
+                    possible
+    Outputs:
+      Returns a list with the result of each query, in the same order
+      as queries.  Each result is the list of strings that
+      compute_top_stats_year or compute_top_stats_career would return.
+
+      The batting and master files are read once and the career totals
+      (if any query needs them) are aggregated once for the whole
+      batch.  The queries are run
+      in a pool of forked processes that share the loaded data; where
+      fork is not available they are run one after another instead.
+    """
+    global _BATCH_STATE
+
+    # Load the shared data once, aggregating the career totals only if
+    # a career query cannot be evaluated over the columns
+    batting = BattingTable(info)
+    career = None
+    if any(year is None and not (vectorized and can_batch(formula, batting))
+           for formula, _, year in queries):
+        career = CareerStats(info['playerid'], info['battingfields'])
+        career.add_rows(batting.rows())
+    get_player_directory(info).load()
+
+    _BATCH_STATE = (info, batting, career, queries, vectorized)
+    try:
+        if processes == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return [_run_batch_query(index) for index in range(len(queries))]
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork')) as executor:
+            chunksize = max(1, len(queries) // (4 * (processes or os.cpu_count() or 1)))
+            return list(executor.map(_run_batch_query, range(len(queries)),
+                                     chunksize=chunksize))
+    finally:
+        _BATCH_STATE = None
+
+
+##
+## Tests for the optional fast paths
+##
+
+def test_read_csv_rows_cached():
+    """
+    Checks that the readers give the same tables with and without the
+    table cache, for a file with blank, short and long rows, and that
+    reading one file with two dialects keeps a cache file for each.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "ragged.csv")
+        with open(filename, 'w', newline='') as csvfile:
+            csvfile.write('id,a,b\r\n1,x,y\r\n\r\n2,x\r\n3,x,y,z\r\n')
+        cachedir = os.path.join(directory, "cache")
+
+        # The first pass fills the cache and the second reads it
+        for _ in range(2):
+            assert (read_csv_as_list_dict(filename, ',', '"', cachedir) ==
+                    read_csv_as_list_dict(filename, ',', '"'))
+            assert (read_csv_as_nested_dict(filename, 'id', ',', '"', cachedir) ==
+                    read_csv_as_nested_dict(filename, 'id', ',', '"'))
+
+        read_csv_rows_cached(filename, ';', '"', cachedir)
+        read_csv_rows_cached(filename, ',', '"', cachedir)
+        assert len(os.listdir(cachedir)) == 2
+
+
+def test_baseball_fast_paths():
+    """
+    Checks that the shared batting table, the cached tables, the NumPy
+    formulas and the batch queries give the same top players as the
+    provided functions, on a small generated data set.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        info = {"masterfile": os.path.join(directory, "Master.csv"),
+                "battingfile": os.path.join(directory, "Batting.csv"),
+                "separator": ",", "quote": '"',
+                "playerid": "playerID", "firstname": "nameFirst",
+                "lastname": "nameLast", "yearid": "yearID",
+                "atbats": "AB", "hits": "H", "doubles": "2B",
+                "triples": "3B", "homeruns": "HR", "walks": "BB",
+                "battingfields": ["AB", "H", "2B", "3B", "HR", "BB"]}
+        with open(info["masterfile"], 'w', newline='') as csvfile:
+            csvfile.write("playerID,nameFirst,nameLast\r\n")
+            for number in range(12):
+                csvfile.write(f"p{number},First{number},Last{number}\r\n")
+        with open(info["battingfile"], 'w', newline='') as csvfile:
+            csvfile.write("playerID,yearID,AB,H,2B,3B,HR,BB\r\n")
+            for number in range(12):
+                for year in (2009, 2010):
+                    at_bats = 400 + 7 * number + year % 2
+                    hits = 90 + (13 * number) % 37 + year % 3
+                    csvfile.write(f"p{number},{year},{at_bats},{hits},"
+                                  f"{number % 5},{number % 3},{number % 4},"
+                                  f"{(11 * number) % 17}\r\n")
+            # A stint with empty fields
+            csvfile.write("p0,2010,,,,,,\r\n")
+
+        ops = sum_formulas(onbase_percentage, slugging_percentage)
+        formulas = [batting_average, onbase_percentage, slugging_percentage, ops]
+        expected = []
+        for formula in formulas:
+            expected.append(compute_top_stats_year(info, formula, 5, 2010))
+            expected.append(compute_top_stats_career(info, formula, 5))
+        assert expected[6] == compute_top_stats_year(
+            info, lambda info, stats: (onbase_percentage(info, stats) +
+                                       slugging_percentage(info, stats)), 5, 2010)
+
+        cached_info = dict(info, cachedir=os.path.join(directory, "cache"))
+        queries = [(formula, 5, year) for formula in formulas for year in (2010, None)]
+        for vectorized in (False, True):
+            if vectorized and numpy is None:
+                continue
+            for batting_info in (info, cached_info, cached_info):
+                batting = BattingTable(batting_info)
+                results = []
+                for formula in formulas:
+                    results.append(compute_top_stats_year(info, formula, 5, 2010,
+                                                          batting, vectorized))
+                    results.append(compute_top_stats_career(info, formula, 5,
+                                                            batting, vectorized))
+                assert results == expected
+            assert compute_top_stats_batch(info, queries, 1, vectorized) == expected
+
+
 ## Provided testing code
 ##
 
@@ -7,6 +7,21 @@ about the expected behavior of the program.
 """
 
 import csv
+import glob
+import gzip
+import hashlib
+import io
+import itertools
+import locale
+import marshal
+import mmap
+import os
+import pickle
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 def read_csv_fieldnames(filename, separator, quote):
     """
@@ -28,45 +43,96 @@ def read_csv_fieldnames(filename, separator, quote):
     return fieldnames
 
 
-def read_csv_as_list_dict(filename, separator, quote):
+def read_csv_as_list_dict(filename, separator, quote, cachedir=None, processes=None):
     """
     Inputs:
       filename  - name of CSV file
       separator - character that separates fields
       quote     - character used to optionally quote fields
+      cachedir  - optional directory for the binary table cache
+      processes - optional number of processes to parse the file with
     Output:
       Returns a list of dictionaries where each item in the list
       corresponds to a row in the CSV file. The dictionaries in the
       list map the field names to the field values for that row.
+      Blank, short and long rows are handled as by csv.DictReader.
     """
-    data = []
-    
+    if cachedir:
+        fieldnames, rows = read_csv_rows_cached(filename, separator, quote, cachedir)
+        return list(_row_dicts(fieldnames, rows))
+    if processes:
+        fieldnames, rows = read_csv_rows_parallel(filename, separator, quote, processes)
+        return list(_row_dicts(fieldnames, rows))
+
     with open(filename, 'r', newline='') as csvfile:
         csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
         
         # Read field names from the first row
         fieldnames = next(csvreader)
         
-        for row in csvreader:
-            # Create a dictionary mapping field names to row values
-            row_dict = {fieldnames[i]: row[i] for i in range(len(fieldnames))}
-            data.append(row_dict)
-    
-    return data
+        # Create a dictionary mapping field names to row values
+        return list(_row_dicts(fieldnames, csvreader))
 
 
-def read_csv_as_nested_dict(filename, keyfield, separator, quote):
+def read_csv_as_nested_dict(filename, keyfield, separator, quote, cachedir=None,
+                            processes=None):
     """
     Inputs:
       filename  - name of CSV file
       keyfield  - field to use as key for rows
       separator - character that separates fields
       quote     - character used to optionally quote fields
+      cachedir  - optional directory for the binary table cache
+      processes - optional number of processes to parse the file with
     Output:
       Returns a dictionary of dictionaries where the outer dictionary
       maps the value in the key_field to the corresponding row in the
       CSV file. The inner dictionaries map the field names to the
-      field values for that row.
+      field values for that row.  Blank, short and long rows are
+      handled as by csv.DictReader.
+    """
+    if cachedir or processes:
+        if cachedir:
+            fieldnames, rows = read_csv_rows_cached(filename, separator, quote, cachedir)
+        else:
+            fieldnames, rows = read_csv_rows_parallel(filename, separator, quote, processes)
+        return {row[keyfield]: row for row in _row_dicts(fieldnames, rows)}
+
+    with open(filename, 'r', newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        header = next(csvreader, [])
+        return {row[keyfield]: row for row in _row_dicts(header, csvreader)}
+
+
+def _row_dicts(fieldnames, rows):
+    """
+    Inputs:
+      fieldnames - list of field names
+      rows       - iterable of rows (sequences of strings), as from
+                   csv.reader
+    Output:
+      Generates the same dictionaries that csv.DictReader would for
+      the given rows: blank rows are skipped, missing fields are None
+      and extra values are listed under the key None.  Rows of the
+      right length are built with a single zip.
+    """
+    numfields = len(fieldnames)
+    for row in rows:
+        if len(row) == numfields:
+            yield dict(zip(fieldnames, row))
+        elif row:
+            rowdict = dict(zip(fieldnames, row))
+            if len(row) > numfields:
+                rowdict[None] = list(row[numfields:])
+            for field in fieldnames[len(row):]:
+                rowdict[field] = None
+            yield rowdict
+
+
+def _read_csv_as_nested_dict_rowwise(filename, keyfield, separator, quote):
+    """
+    Original row-at-a-time version of read_csv_as_nested_dict, kept as
+    the baseline for benchmark_read_csv_as_nested_dict.
     """
     data_dict = {}
     header = []
@@ -85,6 +151,598 @@ def read_csv_as_nested_dict(filename, keyfield, separator, quote):
     return data_dict
 
 
+def benchmark_read_csv_as_nested_dict(filename, keyfield, separator, quote, repeat=3):
+    """
+    Inputs:
+      filename  - name of CSV file
+      keyfield  - field to use as key for rows
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      repeat    - number of times to load the file with each loader
+    Output:
+      Returns a dictionary with the number of rows in the file and
+      the best rows per second achieved by the original row-at-a-time
+      loader ("rowwise") and by read_csv_as_nested_dict ("fast").
+    """
+    with open(filename, 'r', newline='') as csvfile:
+        numrows = max(0, sum(1 for _ in csv.reader(csvfile, delimiter=separator,
+                                                  quotechar=quote)) - 1)
+
+    results = {"rows": numrows}
+    for name, loader in (("rowwise", _read_csv_as_nested_dict_rowwise),
+                         ("fast", read_csv_as_nested_dict)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            loader(filename, keyfield, separator, quote)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = numrows / best if best else float('inf')
+    return results
+
+
+class CompactRow(tuple):
+    """
+    One row of a CompactTable: a tuple of the field values that can
+    also be indexed by field name, as in row["yearID"].
+
+    The field names are shared by all of the rows of a table, so each
+    row costs no more than a tuple.  Membership tests, iteration,
+    keys, values, items and get work as for the dictionary rows of
+    read_csv_as_list_dict (iteration gives the field names).  Integer
+    indexing and slicing give the values by position, and rows
+    compare equal as tuples of their values, not to dictionaries.
+    """
+    __slots__ = ()
+
+    # Field names and the map from field names to positions; set on
+    # the row type of each list of field names
+    _fieldnames = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __reduce__(self):
+        return _compact_row, (self._fieldnames, self.values())
+
+    def get(self, key, default=None):
+        """
+        Returns the value of the field named key, or default if the
+        table has no such field.
+        """
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        """
+        Returns the field names of the row.
+        """
+        return self._index.keys()
+
+    def values(self):
+        """
+        Returns a plain tuple of the field values of the row.
+        """
+        return tuple.__getitem__(self, slice(None))
+
+    def items(self):
+        """
+        Returns a list of (field name, value) tuples for the row.
+        """
+        return [(fieldname, tuple.__getitem__(self, index))
+                for fieldname, index in self._index.items()]
+
+
+# Row types made by _compact_row_type, keyed by tuple of field names
+_ROW_TYPES = {}
+
+def _compact_row_type(fieldnames):
+    """
+    Inputs:
+      fieldnames - tuple of field names
+    Output:
+      Returns the CompactRow subclass for rows with the given field
+      names, shared by every table with the same field names.
+    """
+    row_type = _ROW_TYPES.get(fieldnames)
+    if row_type is None:
+        index = {fieldname: position for position, fieldname in enumerate(fieldnames)}
+        row_type = type('CompactRow', (CompactRow,),
+                        {'__slots__': (), '_fieldnames': fieldnames, '_index': index})
+        _ROW_TYPES[fieldnames] = row_type
+    return row_type
+
+
+def _compact_row(fieldnames, values):
+    """
+    Returns a CompactRow with the given field names (a tuple) and
+    values; used to unpickle rows.
+    """
+    return _compact_row_type(fieldnames)(values)
+
+
+class CompactTable(list):
+    """
+    A list of CompactRow rows that share one list of field names.
+    """
+
+    def __init__(self, fieldnames, rows=()):
+        """
+        Inputs:
+          fieldnames - list of field names
+          rows       - iterable of rows (sequences of field values, or
+                       CompactRows)
+        """
+        self.fieldnames = list(fieldnames)
+        self.row_type = _compact_row_type(tuple(self.fieldnames))
+        super().__init__(map(self._row, rows))
+
+    def _row(self, row):
+        """
+        Returns row (a sequence of field values, or a CompactRow) as a
+        row of this table.
+        """
+        if isinstance(row, CompactRow):
+            # Iterating a CompactRow gives its field names
+            row = row.values()
+        return self.row_type(row)
+
+    def __reduce__(self):
+        return CompactTable, (self.fieldnames, [row.values() for row in self])
+
+    def append(self, row):
+        """
+        Appends a row (a sequence of field values) to the table.
+        """
+        super().append(self._row(row))
+
+    def extend(self, rows):
+        """
+        Appends each of rows (sequences of field values) to the table.
+        """
+        super().extend(map(self._row, rows))
+
+    def insert(self, position, row):
+        """
+        Inserts a row (a sequence of field values) before position.
+        """
+        super().insert(position, self._row(row))
+
+    def __setitem__(self, position, value):
+        if isinstance(position, slice):
+            value = map(self._row, value)
+        else:
+            value = self._row(value)
+        super().__setitem__(position, value)
+
+    def __iadd__(self, rows):
+        self.extend(rows)
+        return self
+
+
+def read_csv_as_compact_table(filename, separator, quote, intern_values=False):
+    """
+    Inputs:
+      filename      - name of CSV file
+      separator     - character that separates fields
+      quote         - character used to optionally quote fields
+      intern_values - if True, share one string object between all
+                      equal field values (slower to load, but much
+                      smaller for tables with many repeated values)
+    Output:
+      Returns a CompactTable with one row per row in the CSV file.
+      Like the dictionaries from read_csv_as_list_dict, each row maps
+      the field names to the field values for that row.
+    """
+    with open(filename, 'r', newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        fieldnames = next(csvreader, [])
+        if intern_values:
+            return CompactTable(fieldnames, (map(sys.intern, row) for row in csvreader))
+        return CompactTable(fieldnames, csvreader)
+
+
+def iter_csv_as_dict(filename, separator, quote, columns=None, predicate=None):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      columns   - optional list of the field names to keep
+      predicate - optional function that takes a row dictionary with
+                  all of the fields (not only those in columns) and
+                  returns True if the row should be kept
+    Output:
+      Generates one dictionary per row in the CSV file, as the file
+      is read.  The dictionaries map the field names in columns (or
+      all field names) to the field values for that row, as in
+      read_csv_as_list_dict.  Only the rows for which predicate
+      returns True are generated.
+    """
+    with open(filename, 'r', newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        fieldnames = next(csvreader, [])
+        if not fieldnames:
+            # An empty file has no rows, as in read_csv_as_list_dict
+            return
+        _check_columns(fieldnames, columns)
+
+        for row_dict in _row_dicts(fieldnames, csvreader):
+            if predicate is None or predicate(row_dict):
+                if columns is not None:
+                    row_dict = {column: row_dict[column] for column in columns}
+                yield row_dict
+
+
+def iter_csv_as_nested_dict(filename, keyfield, separator, quote, columns=None,
+                            predicate=None):
+    """
+    Inputs:
+      filename  - name of CSV file
+      keyfield  - field to use as key for rows
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      columns   - optional list of the field names to keep
+      predicate - optional function that takes a row dictionary with
+                  all of the fields (not only those in columns) and
+                  returns True if the row should be kept
+    Output:
+      Generates one (key, dictionary) tuple per row in the CSV file,
+      as the file is read, where key is the value in the key_field
+      and the dictionary is the row as generated by iter_csv_as_dict.
+      Passing the tuples to dict() gives the same result as
+      read_csv_as_nested_dict (restricted to columns).
+    """
+    with open(filename, 'r', newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        fieldnames = next(csvreader, [])
+        if not fieldnames:
+            # An empty file has no rows, as in read_csv_as_nested_dict
+            return
+        _check_columns(fieldnames, [keyfield] + list(columns or ()))
+
+        for row_dict in _row_dicts(fieldnames, csvreader):
+            if predicate is None or predicate(row_dict):
+                key = row_dict[keyfield]
+                if columns is not None:
+                    row_dict = {column: row_dict[column] for column in columns}
+                yield key, row_dict
+
+
+def _check_columns(fieldnames, columns):
+    """
+    Inputs:
+      fieldnames - list of the field names of a CSV file
+      columns    - list of field names asked for, or None
+    Output:
+      Raises ValueError naming the first of columns that is not in
+      fieldnames, before any row is read.
+    """
+    for column in columns or ():
+        if column not in fieldnames:
+            raise ValueError("{!r} is not a field of the CSV file".format(column))
+
+
+# Separates the values of a column in the table cache
+_CACHE_SEPARATOR = "\x00"
+
+
+def _csv_cache_path(cachedir, filename, separator, quote):
+    """
+    Inputs:
+      cachedir  - Directory holding the cached tables
+      filename  - Name of CSV file
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+    Output:
+      Returns a tuple of the name of the cache file for the current
+      contents of filename and the prefix shared by all cache files
+      for that path, separator and quote.
+    """
+    path = os.path.abspath(filename)
+    status = os.stat(path)
+    key = repr((path, status.st_size, status.st_mtime_ns, separator, quote))
+    dialect = repr((path, separator, quote))
+    prefix = os.path.join(cachedir, "{}-{}-".format(
+        os.path.basename(path), hashlib.sha1(dialect.encode()).hexdigest()[:12]))
+    return prefix + hashlib.sha1(key.encode()).hexdigest() + ".cache", prefix
+
+
+def read_csv_rows_cached(filename, separator, quote, cachedir):
+    """
+    Inputs:
+      filename  - Name of CSV file
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+      cachedir  - Directory holding the cached tables
+    Output:
+      Returns a tuple of the list of field names and the list of
+      rows (tuples of strings) in the CSV file, the same rows (blank
+      ones included) that csv.reader would return.
+
+      The parsed table is stored in a binary cache file the first
+      time it is read.  The cache is keyed by the file path, size,
+      modification time, separator and quote character, so any change
+      to the file (or to the dialect) causes it to be parsed again.
+    """
+    cachepath, prefix = _csv_cache_path(cachedir, filename, separator, quote)
+    try:
+        with open(cachepath, 'rb') as cachefile:
+            fieldnames, columns, rows = marshal.load(cachefile)
+        if columns is not None:
+            # Split each column back into its values and rebuild the rows
+            rows = list(zip(*[column.split(_CACHE_SEPARATOR) for column in columns]))
+        return fieldnames, rows
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with open(filename, newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        fieldnames = next(csvreader, [])
+        rows = [tuple(row) for row in csvreader]
+
+    # Store the table column by column, each column as a single string,
+    # unless the table is empty, ragged or contains the column separator
+    columns = None
+    if rows and all(len(row) == len(fieldnames) for row in rows):
+        columns = [_CACHE_SEPARATOR.join(column) for column in zip(*rows)]
+        if len(columns) != len(fieldnames) or any(
+                column.count(_CACHE_SEPARATOR) != len(rows) - 1 for column in columns):
+            columns = None
+
+    # Replace any stale cache for this file and dialect, writing the new
+    # one atomically
+    os.makedirs(cachedir, exist_ok=True)
+    for stalepath in glob.glob(glob.escape(prefix) + "*.cache"):
+        try:
+            os.remove(stalepath)
+        except OSError:
+            pass
+    temppath = "{}.{}.tmp".format(cachepath, os.getpid())
+    with open(temppath, 'wb') as cachefile:
+        marshal.dump((fieldnames, columns, None if columns else rows), cachefile)
+    os.replace(temppath, cachepath)
+    return fieldnames, rows
+
+
+# Plain decimal literals for each inferred type.  Unlike int() and
+# float(), these reject surrounding spaces, underscores, "nan", "inf"
+# and leading zeros (so that codes such as "007" stay strings).
+_TYPE_PATTERNS = {
+    int: re.compile(r'[-+]?(?:0|[1-9][0-9]*)\Z'),
+    float: re.compile(r'[-+]?(?:(?:0|[1-9][0-9]*)(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][-+]?[0-9]+)?\Z'),
+}
+
+
+def _is_type(value, fieldtype):
+    """
+    Returns True if the string value is a plain decimal literal of
+    fieldtype (int or float).
+    """
+    return _TYPE_PATTERNS[fieldtype].match(value) is not None
+
+
+def infer_csv_schema(filename, separator, quote, numrows=None):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      numrows   - optional number of rows to look at (defaults to all)
+    Output:
+      Returns a dictionary that maps each field name to the type of
+      its values: int if every non-empty value is a plain decimal
+      integer, float if every non-empty value is a plain decimal
+      number, and str otherwise.  Empty values are ignored, as they
+      are loaded as None in int and float fields.
+    """
+    with open(filename, 'r', newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        fieldnames = next(csvreader, [])
+        schema = {fieldname: int for fieldname in fieldnames}
+        for row in itertools.islice(csvreader, numrows):
+            for fieldname, value in zip(fieldnames, row):
+                fieldtype = schema[fieldname]
+                if fieldtype is str or not value:
+                    continue
+                if fieldtype is int and not _is_type(value, int):
+                    fieldtype = float
+                if fieldtype is float and not _is_type(value, float):
+                    fieldtype = str
+                schema[fieldname] = fieldtype
+    return schema
+
+
+def read_csv_as_typed_list_dict(filename, separator, quote, schema=None):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      schema    - optional dictionary mapping field names to int,
+                  float or str (inferred with infer_csv_schema if
+                  not given; fields not in it are kept as strings)
+    Output:
+      Returns a list of dictionaries like read_csv_as_list_dict, but
+      with the values converted to the types in schema once, as the
+      file is loaded.  Empty values in int and float fields become
+      None.  A field with a value that is not a plain decimal literal
+      of its type (as can happen with a schema inferred from only the
+      first rows) is loaded as strings instead.
+    """
+    if schema is None:
+        schema = infer_csv_schema(filename, separator, quote)
+
+    schema = dict(schema)
+    while True:
+        with open(filename, 'r', newline='') as csvfile:
+            csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+            fieldnames = next(csvreader, [])
+            converters = [(fieldname, schema[fieldname], _TYPE_PATTERNS[schema[fieldname]])
+                          for fieldname in fieldnames
+                          if schema.get(fieldname, str) is not str]
+            data = []
+            mismatch = None
+            for row_dict in _row_dicts(fieldnames, csvreader):
+                for fieldname, fieldtype, pattern in converters:
+                    value = row_dict[fieldname]
+                    if not value:
+                        row_dict[fieldname] = None
+                    elif pattern.match(value):
+                        row_dict[fieldname] = fieldtype(value)
+                    else:
+                        mismatch = fieldname
+                        break
+                if mismatch is not None:
+                    break
+                data.append(row_dict)
+        if mismatch is None:
+            return data
+        # Read the file again with the field as strings
+        schema[mismatch] = str
+
+
+def _csv_record_patterns(separator, quote):
+    """
+    Inputs:
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+    Output:
+      Returns a tuple of two compiled byte patterns.  Started at the
+      beginning of a record, the first matches whole quoted fields
+      (as group 1), runs of other characters and stray quotes as far
+      as it can, and the second matches up to and including the next
+      newline that ends a record.
+
+      As in csv.reader, a quote only starts a quoted field at the
+      start of a field; anywhere else it is an ordinary character.
+      Each piece is written so that it can only match in one way,
+      which keeps the patterns from backtracking.
+    """
+    encoding = locale.getpreferredencoding(False)
+    sepbyte = re.escape(separator.encode(encoding))
+    quotebyte = re.escape(quote.encode(encoding))
+    notquote = b"[^" + quotebyte + b"]"
+    quoted = (b"(?:\\A|(?<=" + sepbyte + b")|(?<=\r)|(?<=\n))" + quotebyte +
+              notquote + b"*(?:" + quotebyte * 2 + notquote + b"*)*" +
+              quotebyte + b"(?!" + quotebyte + b")")
+    stray = b"(?<!\\A)(?<!" + sepbyte + b")(?<!\r)(?<!\n)" + quotebyte
+    run = notquote + b"+(?!" + notquote + b")"
+    linerun = b"[^" + quotebyte + b"\n]+(?![^" + quotebyte + b"\n])"
+    return (re.compile(b"(?:(" + quoted + b")|" + run + b"|" + stray + b")*"),
+            re.compile(b"(?:" + quoted + b"|" + linerun + b"|" + stray + b")*\n"))
+
+
+def _csv_chunk_bounds(filename, separator, quote, numchunks):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      numchunks - number of chunks to split the data rows into
+    Output:
+      Returns a list of (start, end) byte offsets.  The first range
+      holds the header row and the others split the data rows into
+      about numchunks ranges of similar size.
+
+      Every range ends just after a newline that ends a record, found
+      by matching the fields (and skipping over quoted fields) from
+      the end of the previous range.
+    """
+    size = os.path.getsize(filename)
+    if size == 0:
+        return [(0, 0)]
+
+    skip_fields, next_record = _csv_record_patterns(separator, quote)
+    with open(filename, 'rb') as csvfile:
+        with mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            bounds = [0]
+            chunksize = None
+            while len(bounds) <= numchunks:
+                if chunksize is None:
+                    # The first boundary is the end of the header row
+                    position = 0
+                else:
+                    # Skip whole fields up to the target, going back to
+                    # the start of the last quoted field skipped in case
+                    # the target cut it short
+                    target = max(bounds[1] + chunksize * (len(bounds) - 1), bounds[-1])
+                    skipped = skip_fields.match(data, bounds[-1], target)
+                    position = skipped.end()
+                    if skipped.end(1) == position:
+                        position = skipped.start(1)
+                record = next_record.match(data, position)
+                if record is None or record.end() >= size:
+                    break
+                bounds.append(record.end())
+                if chunksize is None:
+                    chunksize = max(1, (size - bounds[1]) // numchunks)
+
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _read_csv_chunk(filename, start, end, separator, quote):
+    """
+    Inputs:
+      filename  - name of CSV file
+      start     - offset of the first byte of the chunk
+      end       - offset just after the last byte of the chunk
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+    Output:
+      Returns the list of rows (lists of strings) in the chunk.
+    """
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(start)
+        text = csvfile.read(end - start).decode(locale.getpreferredencoding(False))
+    return list(csv.reader(io.StringIO(text, newline=''), delimiter=separator,
+                           quotechar=quote))
+
+
+def read_csv_rows_parallel(filename, separator, quote, processes=None):
+    """
+    Inputs:
+      filename  - name of CSV file
+      separator - character that separates fields
+      quote     - character used to optionally quote fields
+      processes - number of worker processes (defaults to the number
+                  of CPUs)
+    Output:
+      Returns a tuple of the list of field names and the list of
+      rows (lists of strings) in the CSV file.
+
+      The file is split into byte ranges that start and end on record
+      boundaries, the ranges are parsed in a pool of processes and the
+      rows are put back together in their original order.
+    """
+    processes = processes or os.cpu_count() or 1
+    bounds = _csv_chunk_bounds(filename, separator, quote, processes)
+    header = _read_csv_chunk(filename, *bounds[0], separator, quote)
+    fieldnames = header[0] if header else []
+
+    rows = []
+    if len(bounds) > 1:
+        count = len(bounds) - 1
+        with ProcessPoolExecutor(min(processes, count)) as executor:
+            chunks = executor.map(_read_csv_chunk, [filename] * count,
+                                  [start for start, _ in bounds[1:]],
+                                  [end for _, end in bounds[1:]],
+                                  [separator] * count, [quote] * count)
+            for chunk in chunks:
+                rows.extend(chunk)
+    return fieldnames, rows
+
+
 def write_csv_from_list_dict(filename, table, fieldnames, separator, quote):
     """
     Inputs:
@@ -107,3 +765,146 @@ def write_csv_from_list_dict(filename, table, fieldnames, separator, quote):
         # Write data rows
         for row in table:
             csvwriter.writerow([row[fieldname] if isinstance(row[fieldname], (int, float)) else quote + str(row[fieldname]) + quote for fieldname in fieldnames])
+
+
+def write_csv_from_rows(filename, rows, fieldnames, separator, quote,
+                        compress=False, chunksize=10000):
+    """
+    Inputs:
+      filename   - name of CSV file
+      rows       - iterable (or generator) of dictionaries containing
+                   the table to write
+      fieldnames - list of strings corresponding to the field names in order
+      separator  - character that separates fields
+      quote      - character used to optionally quote fields
+      compress   - if True (or if filename ends in ".gz"), write the
+                   file gzip compressed
+      chunksize  - number of rows formatted before each write
+    Output:
+      Writes the same CSV file as write_csv_from_list_dict, in bulk.
+      Whether each column is numeric is decided once from the first
+      row, rows are formatted and written in chunks through a large
+      buffer, and the file is written under a temporary name and only
+      renamed to filename once it is complete.
+    """
+    doubled = quote * 2
+    tripled = quote * 3
+    lines = [separator.join(quote + fieldname.replace(quote, doubled) + quote
+                            for fieldname in fieldnames)]
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is not None:
+        rows = itertools.chain([first], rows)
+        columns = [(fieldname, isinstance(first[fieldname], (int, float)))
+                   for fieldname in fieldnames]
+
+    temppath = "{}.{}.tmp".format(filename, os.getpid())
+    if compress or filename.endswith('.gz'):
+        csvfile = gzip.open(temppath, 'wt', newline='')
+    else:
+        csvfile = open(temppath, 'w', newline='', buffering=1 << 20)
+    try:
+        with csvfile:
+            for row in rows:
+                lines.append(separator.join(
+                    str(row[fieldname]) if numeric else
+                    tripled + str(row[fieldname]).replace(quote, doubled) + tripled
+                    for fieldname, numeric in columns))
+                if len(lines) >= chunksize:
+                    csvfile.write('\r\n'.join(lines) + '\r\n')
+                    lines = []
+            if lines:
+                csvfile.write('\r\n'.join(lines) + '\r\n')
+        os.replace(temppath, filename)
+    except BaseException:
+        os.remove(temppath)
+        raise
+
+
+##
+## Tests
+##
+
+def test_read_csv_rows_cached():
+    """
+    Checks that read_csv_rows_cached returns the same rows as
+    csv.reader, so that the readers give the same tables with and
+    without the table cache, for a file with blank, short and long
+    rows, and that reading one file with two dialects keeps a cache
+    file for each.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "ragged.csv")
+        with open(filename, 'w', newline='') as csvfile:
+            csvfile.write('id,a,b\r\n1,x,y\r\n\r\n2,x\r\n3,x,y,z\r\n')
+        with open(filename, newline='') as csvfile:
+            csvrows = list(csv.reader(csvfile))
+        cachedir = os.path.join(directory, "cache")
+
+        # The first pass fills the cache and the second reads it
+        for _ in range(2):
+            fieldnames, rows = read_csv_rows_cached(filename, ',', '"', cachedir)
+            assert [fieldnames] + [list(row) for row in rows] == csvrows
+            assert (read_csv_as_list_dict(filename, ',', '"', cachedir) ==
+                    read_csv_as_list_dict(filename, ',', '"'))
+            assert (read_csv_as_nested_dict(filename, 'id', ',', '"', cachedir) ==
+                    read_csv_as_nested_dict(filename, 'id', ',', '"'))
+
+        read_csv_rows_cached(filename, ';', '"', cachedir)
+        assert len(os.listdir(cachedir)) == 2
+
+
+def test_compact_table():
+    """
+    Checks that CompactTable rows act like the dictionary rows of
+    read_csv_as_list_dict, survive pickling and are written by
+    write_csv_from_rows as write_csv_from_list_dict writes the
+    dictionaries.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "table.csv")
+        with open(filename, 'w', newline='') as csvfile:
+            csvfile.write('id,name,"a ""b"""\r\n1,x,y\r\n2,"z, w",3\r\n')
+        table = read_csv_as_compact_table(filename, ',', '"')
+        dicts = read_csv_as_list_dict(filename, ',', '"')
+
+        for row, rowdict in zip(table, dicts):
+            assert "id" in row and "missing" not in row
+            assert list(row) == list(rowdict)
+            assert dict(row) == rowdict and dict(row.items()) == rowdict
+        assert pickle.loads(pickle.dumps(table)) == table
+        assert pickle.loads(pickle.dumps(table[0]))["name"] == "x"
+
+        rowsfile = os.path.join(directory, "rows.csv")
+        dictsfile = os.path.join(directory, "dicts.csv")
+        write_csv_from_rows(rowsfile, table, table.fieldnames, ',', '"')
+        write_csv_from_list_dict(dictsfile, dicts, table.fieldnames, ',', '"')
+        with open(rowsfile, newline='') as file1, open(dictsfile, newline='') as file2:
+            assert file1.read() == file2.read()
+
+
+def test_typed_list_dict():
+    """
+    Checks that only plain decimal literals are inferred as numbers and
+    that a field that does not fit a schema inferred from the first
+    rows is loaded as strings.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "typed.csv")
+        with open(filename, 'w', newline='') as csvfile:
+            csvfile.write('code,count,value,zip\r\n'
+                          'NaN,1,1.5,007\r\nINF,2,-2e3,\r\n'
+                          'A1,1_000, 4,123\r\n')
+        schema = infer_csv_schema(filename, ',', '"')
+        assert schema == {"code": str, "count": str, "value": str, "zip": str}
+
+        sampled = infer_csv_schema(filename, ',', '"', numrows=2)
+        assert sampled == {"code": str, "count": int, "value": float, "zip": str}
+        assert read_csv_as_typed_list_dict(filename, ',', '"', sampled) == \
+            read_csv_as_list_dict(filename, ',', '"')
+
+        with open(filename, 'w', newline='') as csvfile:
+            csvfile.write('count,value\r\n1,.5\r\n,-2e3\r\n')
+        assert read_csv_as_typed_list_dict(filename, ',', '"') == \
+            [{"count": 1, "value": 0.5}, {"count": None, "value": -2000.0}]
@@ -6,8 +6,27 @@ Be sure to read the project description page for further information
 about the expected behavior of the program.
 """
 
+import io
+import itertools
+import json
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 IDENTICAL = -1
 
+# ID given by a LineTable to the lines that are not in its symbols
+UNKNOWN_LINE = -1
+
+# Length below which singleline_diff compares characters one at a time
+DIFF_BLOCK_SIZE = 32
+
+# Size in bytes of the read buffer used by file_diff_format
+FILE_BUFFER_SIZE = 1 << 20
+
+# Size in bytes of the windows compared at once by find_first_difference
+COMPARE_WINDOW_SIZE = 1 << 20
+
 def singleline_diff(line1, line2):
     """
     Inputs:
@@ -19,21 +38,33 @@ def singleline_diff(line1, line2):
 
       Returns IDENTICAL if the two lines are the same.
     """
+    # Compare the whole lines at once first
+    if line1 == line2:
+        return IDENTICAL
+
     # Find the minimum length of the two lines
     min_len = min(len(line1), len(line2))
     
-    # Compare characters of both lines up to the minimum length
-    for index in range(min_len):
+    # Bisect over slices of both lines (each comparison runs in C) until
+    # the first difference is known to be within a short block.  The
+    # lines are equal before low, and differ before high unless high is
+    # still min_len.
+    low, high = 0, min_len
+    while high - low > DIFF_BLOCK_SIZE:
+        middle = (low + high) // 2
+        if line1[low:middle] == line2[low:middle]:
+            low = middle
+        else:
+            high = middle
+    
+    # Compare characters of the remaining block
+    for index in range(low, high):
         if line1[index] != line2[index]:
             return index
     
-    # If no differences found within the range of the shorter line,
-    # check if the lengths of the lines are different
-    if len(line1) != len(line2):
-        return min_len
-    
-    # If lines are identical
-    return IDENTICAL
+    # No differences found within the range of the shorter line, so the
+    # lines differ in length
+    return min_len
 
 
 
@@ -73,8 +104,8 @@ def singleline_diff_format(line1, line2, idx):
 def multiline_diff(lines1, lines2):
     """
     Inputs:
-      lines1 - list of single line strings
-      lines2 - list of single line strings
+      lines1 - list of single line strings, or a LineTable
+      lines2 - list of single line strings, or a LineTable
     Output:
       Returns a tuple containing the line number (starting from 0) and
       the index in that line where the first difference between lines1
@@ -82,13 +113,18 @@ def multiline_diff(lines1, lines2):
 
       Returns (IDENTICAL, IDENTICAL) if the two lists are the same.
     """
+    # Equal lines are skipped by comparing their IDs (or the lines
+    # themselves), and only the first mismatch is compared character
+    # by character
+    keys1, keys2, lines1, lines2 = _line_keys(lines1, lines2)
+
     # Find the minimum length of the two lists
     min_len = min(len(lines1), len(lines2))
     
     # Compare lines up to the length of the shorter list
-    for line_index in range(min_len):
-        char_index = singleline_diff(lines1[line_index], lines2[line_index])
-        if char_index != IDENTICAL:
+    for line_index, (key1, key2) in enumerate(zip(keys1, keys2)):
+        if key1 != key2:
+            char_index = singleline_diff(lines1[line_index], lines2[line_index])
             return (line_index, char_index)
     
     # If no differences found within the range of the shorter list,
@@ -120,11 +156,207 @@ def get_file_lines(filename):
 
 
 
-def file_diff_format(filename1, filename2):
+def get_file_lines_binary(filename, whitespace="strip"):
+    """
+    Inputs:
+      filename   - name of file to read
+      whitespace - "strip" to remove leading and trailing whitespace
+                   from each line (as get_file_lines does), "rstrip"
+                   to only remove trailing whitespace, or "none" to
+                   keep the lines as they are
+    Output:
+      Returns a list of lines from the file named filename as bytes,
+      without decoding them.  Lines end at '\n', '\r\n' or '\r', as
+      in get_file_lines, but only ASCII whitespace is stripped.
+    """
+    with open(filename, 'rb') as file:
+        lines = file.read().splitlines()
+    if whitespace == "strip":
+        return [line.strip() for line in lines]
+    if whitespace == "rstrip":
+        return [line.rstrip() for line in lines]
+    if whitespace == "none":
+        return lines
+    raise ValueError(f"unknown whitespace mode: {whitespace!r}")
+
+
+class LineTable:
+    """
+    Lines of a file together with a small integer ID for each distinct
+    line.  A table built with the symbols dictionary of another table
+    gives the lines they have in common the same IDs, so the two can
+    be compared line by line without looking at the characters.  The
+    other table's symbols are only looked up, never added to, so one
+    table can be reused to compare the same file against many others
+    without growing.
+
+    The lines may be kept as undecoded bytes, in which case indexing
+    the table decodes only the lines asked for.
+    """
+
+    def __init__(self, lines, symbols=None, encoding=None):
+        """
+        Inputs:
+          lines    - list of single line strings, or of bytes
+          symbols  - optional symbols dictionary of the table to compare
+                     this one with; lines that are not in it get the ID
+                     UNKNOWN_LINE.  If omitted, a new dictionary holding
+                     all of the lines is made.
+          encoding - encoding of the lines if they are bytes, or None
+        """
+        if symbols is None:
+            symbols = {}
+            self.ids = [symbols.setdefault(line, len(symbols)) for line in lines]
+        else:
+            self.ids = [symbols.get(line, UNKNOWN_LINE) for line in lines]
+        self.lines = lines
+        self.symbols = symbols
+        self.encoding = encoding
+        self.complete = UNKNOWN_LINE not in self.ids
+
+    @classmethod
+    def from_file(cls, filename, symbols=None, whitespace="strip", encoding="utf-8"):
+        """
+        Inputs:
+          filename   - name of file to read
+          symbols    - optional symbols dictionary of the table to
+                       compare this one with (see __init__)
+          whitespace - whitespace handling (see get_file_lines_binary)
+          encoding   - encoding of the file
+        Output:
+          Returns a LineTable of the undecoded lines of the file named
+          filename (as returned by get_file_lines_binary).
+        """
+        return cls(get_file_lines_binary(filename, whitespace), symbols, encoding)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, index):
+        """
+        Returns the line (or list of lines, for a slice) at index as
+        a string, decoding it if needed.  Bytes that are not valid in
+        the encoding are replaced.
+        """
+        if self.encoding is None:
+            return self.lines[index]
+        if isinstance(index, slice):
+            return [line.decode(self.encoding, 'replace') for line in self.lines[index]]
+        return self.lines[index].decode(self.encoding, 'replace')
+
+
+def _line_keys(lines1, lines2):
+    """
+    Inputs:
+      lines1 - list of single line strings, or a LineTable
+      lines2 - list of single line strings, or a LineTable
+    Output:
+      Returns a tuple (keys1, keys2, lines1, lines2).  If both inputs
+      are LineTables with the same symbols and encoding, and at least
+      one of them has no UNKNOWN_LINE IDs (so that equal IDs always
+      mean equal lines), keys1 and keys2 are their line IDs and lines1
+      and lines2 are the tables, which decode the lines that are
+      looked up.  Otherwise the inputs are turned into lists of
+      strings, which are used as both the keys and the lines.
+    """
+    if isinstance(lines1, LineTable) and isinstance(lines2, LineTable) \
+       and lines1.symbols is lines2.symbols and lines1.encoding == lines2.encoding \
+       and (lines1.complete or lines2.complete):
+        return lines1.ids, lines2.ids, lines1, lines2
+    if isinstance(lines1, LineTable):
+        lines1 = lines1[:]
+    if isinstance(lines2, LineTable):
+        lines2 = lines2[:]
+    return lines1, lines2, lines1, lines2
+
+
+def fan_out_diff(filename, filenames):
+    """
+    Inputs:
+      filename  - name of the file to compare against the others
+      filenames - iterable of names of files to compare it with
+    Output:
+      Generates a tuple (other filename, (line number, index)) with the
+      result of multiline_diff for each file in filenames.  The first
+      file is read and its lines given IDs only once, and the lines of
+      the other files are looked up in its symbols.  The lines are compared as
+      bytes (see LineTable.from_file).
+    """
+    table = LineTable.from_file(filename)
+    for other in filenames:
+        yield other, multiline_diff(table, LineTable.from_file(other, table.symbols))
+
+
+def _count_lines(data, start, end, window=COMPARE_WINDOW_SIZE):
+    """
+    Inputs:
+      data   - bytes-like object (such as a memory map) of file contents
+      start  - offset to start counting from
+      end    - offset to stop counting at, just after a newline ('\n')
+      window - number of bytes to count in at once
+    Output:
+      Returns the number of lines between start and end, counting
+      "\n", "\r\n" and "\r" line endings as text mode reading does.
+    """
+    count = 0
+    for low in range(start, end, window):
+        high = min(low + window, end)
+        chunk = data[low:high]
+        count += chunk.count(b'\n') + chunk.count(b'\r') - chunk.count(b'\r\n')
+        if chunk.endswith(b'\r') and data[high:high + 1] == b'\n':
+            # A "\r\n" split across two windows is a single line ending
+            count -= 1
+    return count
+
+
+def find_first_difference(filename1, filename2, window=COMPARE_WINDOW_SIZE):
+    """
+    Inputs:
+      filename1 - name of first file
+      filename2 - name of second file
+      window    - number of bytes to compare at once
+    Output:
+      Returns None if the two files have exactly the same bytes.
+
+      Otherwise, returns a tuple of the offset of the start of the
+      line holding the first differing byte and the number of that
+      line (starting from 0).  All of the lines before it are the
+      same in both files.
+
+      Both files are memory mapped and compared a window at a time.
+    """
+    size1 = os.path.getsize(filename1)
+    size2 = os.path.getsize(filename2)
+    min_size = min(size1, size2)
+    if min_size == 0:
+        return None if size1 == size2 else (0, 0)
+
+    with open(filename1, 'rb') as file1, open(filename2, 'rb') as file2:
+        with mmap.mmap(file1.fileno(), 0, access=mmap.ACCESS_READ) as data1, \
+             mmap.mmap(file2.fileno(), 0, access=mmap.ACCESS_READ) as data2:
+            offset = min_size
+            for low in range(0, min_size, window):
+                high = min(low + window, min_size)
+                index = singleline_diff(data1[low:high], data2[low:high])
+                if index != IDENTICAL:
+                    offset = low + index
+                    break
+            else:
+                if size1 == size2:
+                    return None
+
+            # Back up to the start of the line (just after a '\n', so
+            # that a "\r\n" line ending is never split)
+            start = data1.rfind(b'\n', 0, offset) + 1
+            return start, _count_lines(data1, 0, start, window)
+
+
+def file_diff_format(filename1, filename2, bufsize=FILE_BUFFER_SIZE):
     """
     Inputs:
       filename1 - name of first file
       filename2 - name of second file
+      bufsize   - size in bytes of the read buffer for each file
     Output:
       Returns a four line string showing the location of the first
       difference between the two files named by the inputs.
@@ -132,19 +364,338 @@ def file_diff_format(filename1, filename2):
       If the files are identical, the function instead returns the
       string "No differences\n".
 
+      If one file is a prefix of the other, the missing line is shown
+      as an empty line.  Identical files are detected by comparing
+      their bytes; otherwise the files are compared line by line from
+      the line holding the first differing byte, as they are read, so
+      at most one buffer per file is held in memory.
+
       If either file does not exist or is not readable, then the
       behavior of this function is undefined.
     """
-    lines1 = get_file_lines(filename1)
-    lines2 = get_file_lines(filename2)
-    
-    line_index, char_index = multiline_diff(lines1, lines2)
-    
-    if line_index == IDENTICAL:
+    # Compare the raw bytes first, and skip the lines before the first
+    # differing byte
+    difference = find_first_difference(filename1, filename2)
+    if difference is None:
         return "No differences\n"
+    start, first_line = difference
+
+    # Read both files side by side from there, one buffered chunk at a
+    # time, and stop at the first differing line
+    with open(filename1, 'rb', buffering=bufsize) as raw1, \
+         open(filename2, 'rb', buffering=bufsize) as raw2:
+        raw1.seek(start)
+        raw2.seek(start)
+        pairs = itertools.zip_longest(io.TextIOWrapper(raw1), io.TextIOWrapper(raw2))
+        for line_index, (diff_line1, diff_line2) in enumerate(pairs, first_line):
+            if diff_line1 is None or diff_line2 is None:
+                # One file has more lines than the other
+                char_index = 0
+            else:
+                char_index = singleline_diff(diff_line1.strip(), diff_line2.strip())
+                if char_index == IDENTICAL:
+                    continue
+            
+            diff_line1 = (diff_line1 or "").strip()
+            diff_line2 = (diff_line2 or "").strip()
+            formatted_diff = singleline_diff_format(diff_line1, diff_line2, char_index)
+            return f"Line {line_index}:\n{formatted_diff}"
     
-    diff_line1 = lines1[line_index]
-    diff_line2 = lines2[line_index]
-    formatted_diff = singleline_diff_format(diff_line1, diff_line2, char_index)
-    
-    return f"Line {line_index}:\n{formatted_diff}"
+    return "No differences\n"
+
+
+def directory_file_pairs(directory1, directory2):
+    """
+    Inputs:
+      directory1 - name of first directory
+      directory2 - name of second directory
+    Output:
+      Returns a sorted list of (filename1, filename2) tuples, one for
+      each file in the tree under directory1 or directory2, pairing
+      the files with the same path relative to their directory.  A
+      file that is only in one of the trees is paired with the name
+      it would have in the other tree.
+    """
+    relative_names = set()
+    for directory in (directory1, directory2):
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                relative_names.add(os.path.relpath(os.path.join(root, filename), directory))
+    return [(os.path.join(directory1, name), os.path.join(directory2, name))
+            for name in sorted(relative_names)]
+
+
+def _file_signature(filename):
+    """
+    Returns a list of the size and modification time of the file
+    named filename, or None if there is no such file.
+    """
+    try:
+        status = os.stat(filename)
+    except OSError:
+        return None
+    return [status.st_size, status.st_mtime_ns]
+
+
+def _diff_file_pair(pair):
+    """
+    Returns file_diff_format for a (filename1, filename2) tuple.
+    """
+    return file_diff_format(*pair)
+
+
+def batch_file_diff(pairs, cachefile=None, processes=None):
+    """
+    Inputs:
+      pairs     - iterable of (filename1, filename2) tuples, as from
+                  directory_file_pairs
+      cachefile - optional name of a JSON file holding the results of
+                  previous runs
+      processes - number of worker processes (defaults to the number
+                  of CPUs)
+    Output:
+      Generates a (filename1, filename2, result) tuple for each pair,
+      in order, as the results become available.  The result is the
+      string returned by file_diff_format, or None if either file
+      does not exist.
+
+      The comparisons are run in a pool of processes.  Pairs whose
+      files have the same size and modification time as in the cache
+      are not compared again, and the cache is updated with the new
+      results when the generator finishes.
+    """
+    pairs = list(pairs)
+    cache = {}
+    if cachefile is not None and os.path.exists(cachefile):
+        with open(cachefile, 'r') as jsonfile:
+            cache = json.load(jsonfile)
+
+    # Look up each pair in the cache and compare the others in the pool
+    results = []
+    pending = {}
+    for index, (filename1, filename2) in enumerate(pairs):
+        key = "{}\n{}".format(os.path.abspath(filename1), os.path.abspath(filename2))
+        signature = [_file_signature(filename1), _file_signature(filename2)]
+        entry = cache.get(key)
+        if entry is not None and entry["signature"] == signature:
+            results.append(entry["result"])
+        else:
+            results.append(None)
+            if None not in signature:
+                pending[index] = (key, signature)
+
+    executor = ProcessPoolExecutor(processes) if pending else None
+    try:
+        futures = {index: executor.submit(_diff_file_pair, pairs[index])
+                   for index in pending}
+        for index, (filename1, filename2) in enumerate(pairs):
+            if index in futures:
+                results[index] = futures[index].result()
+                key, signature = pending[index]
+                cache[key] = {"signature": signature, "result": results[index]}
+            yield filename1, filename2, results[index]
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if cachefile is not None:
+            temppath = "{}.{}.tmp".format(cachefile, os.getpid())
+            with open(temppath, 'w') as jsonfile:
+                json.dump(cache, jsonfile)
+            os.replace(temppath, cachefile)
+
+
+def _middle_snake(seq1, low1, high1, seq2, low2, high2):
+    """
+    Inputs:
+      seq1, seq2  - sequences to compare
+      low1, high1 - range of seq1 to compare
+      low2, high2 - range of seq2 to compare (the first and last
+                    items of both ranges must differ)
+    Output:
+      Returns a tuple (start1, start2, end1, end2) giving the middle
+      snake of a shortest edit script between the two ranges: a run
+      of equal items seq1[start1:end1] == seq2[start2:end2] that splits
+      the script into two halves with about the same number of edits
+      (Myers, "An O(ND) Difference Algorithm and Its Variations").
+
+      The forward and reverse searches only keep the furthest point
+      reached on each diagonal, so this uses linear space.
+    """
+    len1 = high1 - low1
+    len2 = high2 - low2
+    delta = len1 - len2
+    odd = delta % 2 == 1
+    max_edits = (len1 + len2 + 1) // 2
+    offset = max_edits + 1
+
+    # Furthest x reached on each diagonal k = x - y, or -1 if none
+    forward = [-1] * (2 * max_edits + 3)
+    reverse = [-1] * (2 * max_edits + 3)
+    forward[offset + 1] = 0
+    reverse[offset + 1] = 0
+
+    for edits in range(max_edits + 1):
+        for paths, other, direction in ((forward, reverse, 1), (reverse, forward, -1)):
+            for diagonal in range(-edits, edits + 1, 2):
+                # Extend the furthest neighboring path by one edit,
+                # staying within the ranges
+                down = paths[offset + diagonal + 1]
+                right = paths[offset + diagonal - 1] + 1
+                if down < 0 or down - diagonal > len2:
+                    down = -1
+                if right <= 0 or right > len1:
+                    right = -1
+                x = max(down, right)
+                if x < 0:
+                    paths[offset + diagonal] = -1
+                    continue
+
+                # Follow the snake of equal items
+                y = x - diagonal
+                start_x, start_y = x, y
+                if direction == 1:
+                    while x < len1 and y < len2 and seq1[low1 + x] == seq2[low2 + y]:
+                        x += 1
+                        y += 1
+                else:
+                    while x < len1 and y < len2 and \
+                          seq1[high1 - 1 - x] == seq2[high2 - 1 - y]:
+                        x += 1
+                        y += 1
+                paths[offset + diagonal] = x
+
+                # Check for overlap with the other search, which has made
+                # edits - 1 (forward) or edits (reverse) edits so far
+                if (direction == 1) != odd:
+                    continue
+                other_diagonal = delta - diagonal
+                limit = edits - 1 if direction == 1 else edits
+                if -limit <= other_diagonal <= limit and other[offset + other_diagonal] >= 0 \
+                   and x + other[offset + other_diagonal] >= len1:
+                    if direction == 1:
+                        return low1 + start_x, low2 + start_y, low1 + x, low2 + y
+                    return high1 - x, high2 - y, high1 - start_x, high2 - start_y
+
+    raise AssertionError("no middle snake found")
+
+
+def _matching_runs(seq1, seq2):
+    """
+    Inputs:
+      seq1, seq2 - sequences to compare
+    Output:
+      Generates (start1, start2, length) tuples, in order, for the
+      runs of equal items seq1[start1:start1 + length] ==
+      seq2[start2:start2 + length] of a longest common subsequence.
+
+      The ranges between the runs are split at their middle snake
+      using an explicit stack, so that neither the recursion depth
+      nor the memory grow with the number of differences.
+    """
+    stack = [(0, len(seq1), 0, len(seq2), None)]
+    while stack:
+        low1, high1, low2, high2, run = stack.pop()
+        if run is not None:
+            yield run
+            continue
+
+        # Strip the common prefix and suffix of the ranges
+        start1, start2 = low1, low2
+        while low1 < high1 and low2 < high2 and seq1[low1] == seq2[low2]:
+            low1 += 1
+            low2 += 1
+        if low1 > start1:
+            yield start1, start2, low1 - start1
+        end1 = high1
+        while high1 > low1 and high2 > low2 and seq1[high1 - 1] == seq2[high2 - 1]:
+            high1 -= 1
+            high2 -= 1
+        if high1 < end1:
+            stack.append((0, 0, 0, 0, (high1, high2, end1 - high1)))
+
+        # Split what is left at its middle snake (last pushed is first)
+        if low1 < high1 and low2 < high2:
+            snake1, snake2, snake_end1, snake_end2 = _middle_snake(
+                seq1, low1, high1, seq2, low2, high2)
+            stack.append((snake_end1, high1, snake_end2, high2, None))
+            if snake_end1 > snake1:
+                stack.append((0, 0, 0, 0, (snake1, snake2, snake_end1 - snake1)))
+            stack.append((low1, snake1, low2, snake2, None))
+
+
+def edit_script(lines1, lines2):
+    """
+    Inputs:
+      lines1 - list of single line strings, or a LineTable
+      lines2 - list of single line strings, or a LineTable
+    Output:
+      Generates the hunks of a shortest edit script that turns lines1
+      into lines2, in order.  Each hunk is a tuple (start1, end1,
+      start2, end2): lines1[start1:end1] are deleted and
+      lines2[start2:end2] are inserted in their place.  Either range
+      may be empty.
+
+      Generates nothing if the two lists are the same.
+    """
+    # Compare small integer IDs instead of the lines themselves
+    seq1, seq2, lines1, lines2 = _line_keys(lines1, lines2)
+    if seq1 is lines1:
+        table1 = LineTable(lines1)
+        seq1 = table1.ids
+        seq2 = LineTable(lines2, table1.symbols).ids
+
+    index1 = index2 = 0
+    for start1, start2, length in _matching_runs(seq1, seq2):
+        if start1 > index1 or start2 > index2:
+            yield index1, start1, index2, start2
+        index1, index2 = start1 + length, start2 + length
+    if index1 < len(seq1) or index2 < len(seq2):
+        yield index1, len(seq1), index2, len(seq2)
+
+
+def hunk_diff_format(lines1, lines2, hunk):
+    """
+    Inputs:
+      lines1 - list of single line strings
+      lines2 - list of single line strings
+      hunk   - tuple (start1, end1, start2, end2) from edit_script
+    Output:
+      Returns a formatted string for the hunk.  The first line gives
+      the line ranges (starting from 0, end excluded) in both lists.
+      Each changed line that has a counterpart in the other list is
+      shown as by singleline_diff_format, and the remaining deleted
+      and inserted lines follow, prefixed by "< " and "> ".
+    """
+    start1, end1, start2, end2 = hunk
+    parts = [f"Lines {start1}-{end1} / {start2}-{end2}:\n"]
+    paired = min(end1 - start1, end2 - start2)
+    for offset in range(paired):
+        line1 = lines1[start1 + offset]
+        line2 = lines2[start2 + offset]
+        parts.append(singleline_diff_format(line1, line2, singleline_diff(line1, line2)))
+    for line1 in lines1[start1 + paired:end1]:
+        parts.append(f"< {line1}\n")
+    for line2 in lines2[start2 + paired:end2]:
+        parts.append(f"> {line2}\n")
+    return "".join(parts)
+
+
+def file_edit_script_format(filename1, filename2):
+    """
+    Inputs:
+      filename1 - name of first file
+      filename2 - name of second file
+    Output:
+      Generates the formatted hunks (see hunk_diff_format) of every
+      difference between the two files named by the inputs, in order,
+      or just "No differences\n" if the files are identical.  The files
+      are read as bytes and only the lines shown are decoded.
+    """
+    lines1 = LineTable.from_file(filename1)
+    lines2 = LineTable.from_file(filename2, lines1.symbols)
+    found = False
+    for hunk in edit_script(lines1, lines2):
+        found = True
+        yield hunk_diff_format(lines1, lines2, hunk)
+    if not found:
+        yield "No differences\n"
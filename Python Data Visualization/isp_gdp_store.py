@@ -0,0 +1,127 @@
+"""
+Shared GDP data for the "Python Data Visualization" projects.
+
+Loads the World Bank GDP file described by a GDP information
+dictionary once, into a dense country x year matrix of floats, so
+that build_plot_dict (isp_plot_template), build_map_dict_by_name
+(isp_unify_template) and build_map_dict_by_code (isp_maps_template)
+can all take the same store instead of re-reading the file.
+"""
+
+import csv
+import math
+import os
+import sys
+from array import array
+
+
+class GDPStore:
+    """
+    GDP values of every country in a GDP file for the years between
+    "min_year" and "max_year", inclusive.
+
+    The values are kept row by row in a single array of floats, with
+    one row per line of the file and NaN for missing or invalid
+    values.  The rows can be looked up by country name (as in the file,
+    or stripped of surrounding whitespace) or by stripped country code;
+    when a name or code appears more than once, the last row wins.
+    """
+
+    __slots__ = ('years', 'values', 'names', 'stripped_names', 'codes')
+
+    def __init__(self, gdpinfo):
+        """
+        Inputs:
+          gdpinfo - GDP data information dictionary
+        """
+        self.years = list(range(int(gdpinfo['min_year']), int(gdpinfo['max_year']) + 1))
+        self.values = array('d')
+        self.names = {}
+        self.stripped_names = {}
+        self.codes = {}
+
+        nan = math.nan
+        with open(gdpinfo['gdpfile'], 'r', newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile, delimiter=gdpinfo['separator'],
+                                quotechar=gdpinfo['quote'])
+            header = next(reader, [])
+            nameindex = header.index(gdpinfo['country_name'])
+            codeindex = header.index(gdpinfo['country_code'])
+            columns = {field: index for index, field in enumerate(header)}
+            yearindexes = [columns.get(str(year)) for year in self.years]
+
+            rowindex = 0
+            for row in reader:
+                if not row:
+                    # Skip blank lines, as csv.DictReader does
+                    continue
+                name = sys.intern(row[nameindex]) if nameindex < len(row) else ""
+                code = row[codeindex] if codeindex < len(row) else ""
+                self.names[name] = rowindex
+                self.stripped_names[name.strip()] = rowindex
+                self.codes[sys.intern(code.strip())] = rowindex
+                for index in yearindexes:
+                    value = row[index] if index is not None and index < len(row) else ""
+                    try:
+                        self.values.append(float(value) if value else nan)
+                    except ValueError:
+                        self.values.append(nan)
+                rowindex += 1
+
+    def __len__(self):
+        return len(self.values) // len(self.years) if self.years else 0
+
+    def series(self, row):
+        """
+        Inputs:
+          row - Row number of a country (from names, stripped_names or
+                codes)
+        Output:
+          Returns an array of the GDP values of the country, one for
+          each year in years.
+        """
+        numyears = len(self.years)
+        return self.values[row * numyears:(row + 1) * numyears]
+
+    def cross_section(self, year):
+        """
+        Inputs:
+          year - Year (integer, or string as in the GDP file header)
+        Output:
+          Returns an array of the GDP values of every row for the year,
+          indexed by row number, or None if the year is not in the
+          store.
+        """
+        if not self.years:
+            return None
+        try:
+            column = int(year) - self.years[0]
+        except ValueError:
+            return None
+        if not 0 <= column < len(self.years) or str(self.years[column]) != str(year):
+            return None
+        return self.values[column::len(self.years)]
+
+
+# GDP stores shared across calls, keyed by GDP file and format
+_GDP_STORES = {}
+
+def get_gdp_store(gdpinfo):
+    """
+    Inputs:
+      gdpinfo - GDP data information dictionary
+    Output:
+      Returns the GDPStore shared by all calls with the same GDP file
+      (as of its current size and modification time) and format.
+    """
+    gdpfile = os.path.abspath(gdpinfo['gdpfile'])
+    stat = os.stat(gdpfile)
+    key = (gdpfile, stat.st_size, stat.st_mtime_ns, gdpinfo['separator'],
+           gdpinfo['quote'], int(gdpinfo['min_year']), int(gdpinfo['max_year']),
+           gdpinfo['country_name'], gdpinfo['country_code'])
+    if key not in _GDP_STORES:
+        # Drop stores for older versions of the same GDP file
+        for stale in [stale for stale in _GDP_STORES if stale[0] == gdpfile]:
+            del _GDP_STORES[stale]
+        _GDP_STORES[key] = GDPStore(gdpinfo)
+    return _GDP_STORES[key]
@@ -8,7 +8,9 @@ about the expected behavior of the program.
 
 import csv
 import math
+import multiprocessing
 import pygal
+from concurrent.futures import ProcessPoolExecutor
 
 
 def build_country_code_converter(codeinfo):
@@ -75,13 +77,15 @@ def reconcile_countries_by_code(codeinfo, plot_countries, gdp_countries):
     return plot_to_gdp, not_found
 
 
-def build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year):
+def build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year, store=None):
     """
     Inputs:
       gdpinfo        - A GDP information dictionary
       codeinfo       - A country code information dictionary
       plot_countries - Dictionary mapping plot library country codes to country names
       year           - String year for which to create GDP mapping
+      store          - Optional GDPStore (see isp_gdp_store) already
+                       loaded from the GDP file described by gdpinfo
 
     Output:
       A tuple containing a dictionary and two sets.  The dictionary
@@ -92,21 +96,54 @@ def build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year):
       codes from plot_countries that were found in the GDP data file, but
       have no GDP data for the specified year.
     """
-    gdp_map = {}
-    not_found_countries = set()
-    no_gdp_data_countries = set()
-    
-    # Load the GDP data
-    with open(gdpinfo['gdpfile'], 'r') as csvfile:
-        reader = csv.DictReader(csvfile, delimiter=gdpinfo['separator'], quotechar=gdpinfo['quote'])
-        gdp_data = {row[gdpinfo['country_code']].strip(): row for row in reader}
+    # Load the GDP data, or map the stripped country codes to rows of
+    # the store
+    if store is not None:
+        gdp_data = store.codes
+    else:
+        with open(gdpinfo['gdpfile'], 'r') as csvfile:
+            reader = csv.DictReader(csvfile, delimiter=gdpinfo['separator'], quotechar=gdpinfo['quote'])
+            gdp_data = {row[gdpinfo['country_code']].strip(): row for row in reader}
     
     # Reconcile countries
     plot_to_gdp, not_found_countries = reconcile_countries_by_code(codeinfo, plot_countries, gdp_data)
     
     # Process the GDP data
+    gdp_map, no_gdp_data_countries = build_year_map(plot_to_gdp, gdp_data, year, store)
+    
+    return gdp_map, not_found_countries, no_gdp_data_countries
+
+
+def build_year_map(plot_to_gdp, gdp_data, year, store=None):
+    """
+    Inputs:
+      plot_to_gdp - Dictionary mapping plot library country codes to
+                    GDP country codes (from reconcile_countries_by_code)
+      gdp_data    - Dictionary mapping GDP country codes to the rows of
+                    the GDP file, or to row numbers of store
+      year        - String year for which to create GDP mapping
+      store       - Optional GDPStore that gdp_data refers to
+
+    Output:
+      A tuple containing a dictionary and a set.  The dictionary maps
+      country codes from plot_to_gdp to the log (base 10) of the GDP
+      value for that country in the specified year.  The set contains
+      the country codes from plot_to_gdp that have no GDP data for the
+      specified year.
+    """
+    gdp_map = {}
+    no_gdp_data_countries = set()
+
+    # The values for the year are one slice of the store
+    year_values = store.cross_section(year) if store is not None else None
+
     for plot_code, gdp_code in plot_to_gdp.items():
-        gdp_value = gdp_data[gdp_code].get(year, '')
+        if store is None:
+            gdp_value = gdp_data[gdp_code].get(year, '')
+        elif year_values is None or math.isnan(year_values[gdp_data[gdp_code]]):
+            gdp_value = None
+        else:
+            gdp_value = year_values[gdp_data[gdp_code]]
         if gdp_value:
             try:
                 gdp_map[plot_code] = math.log10(float(gdp_value))
@@ -114,10 +151,10 @@ def build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year):
                 no_gdp_data_countries.add(plot_code)
         else:
             no_gdp_data_countries.add(plot_code)
-    
-    return gdp_map, not_found_countries, no_gdp_data_countries
 
-def render_world_map(gdpinfo, codeinfo, plot_countries, year, map_file):
+    return gdp_map, no_gdp_data_countries
+
+def render_world_map(gdpinfo, codeinfo, plot_countries, year, map_file, store=None):
     """
     Inputs:
       gdpinfo        - A GDP information dictionary
@@ -125,6 +162,7 @@ def render_world_map(gdpinfo, codeinfo, plot_countries, year, map_file):
       plot_countries - Dictionary mapping plot library country codes to country names
       year           - String year of data
       map_file       - String that is the output map file name
+      store          - Optional GDPStore to build the map from
 
     Output:
       Returns None.
@@ -134,8 +172,30 @@ def render_world_map(gdpinfo, codeinfo, plot_countries, year, map_file):
       it to a file named by svg_filename.
     """
     # Get the GDP data
-    gdp_map, not_found_countries, no_gdp_data_countries = build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year)
+    gdp_map, not_found_countries, no_gdp_data_countries = build_map_dict_by_code(gdpinfo, codeinfo, plot_countries, year, store)
+
+    write_world_map(year, gdp_map, not_found_countries, no_gdp_data_countries, map_file)
+
+
+def write_world_map(year, gdp_map, not_found_countries, no_gdp_data_countries, map_file):
+    """
+    Inputs:
+      year                  - String year of data
+      gdp_map               - Dictionary mapping plot library country
+                              codes to the log (base 10) of their GDP
+      not_found_countries   - Set of plot library country codes missing
+                              from the GDP data
+      no_gdp_data_countries - Set of plot library country codes with no
+                              GDP data for the year
+      map_file              - String that is the output map file name
+
+    Output:
+      Returns None.
 
+    Action:
+      Creates a world map plot of the GDP data in gdp_map and outputs
+      it to a file named by map_file.
+    """
     # Create a world map
     worldmap_chart = pygal.maps.world.World()
     worldmap_chart.title = f'World GDP in {year}'
@@ -149,6 +209,73 @@ def render_world_map(gdpinfo, codeinfo, plot_countries, year, map_file):
     worldmap_chart.render_to_file(map_file)
 
 
+# Reconciled data for _render_year, set by render_world_maps
+_RENDER_STATE = None
+
+def _render_year(year):
+    """
+    Inputs:
+      year - String year of data
+    Output:
+      Returns the name of the map file written for the year.
+    """
+    plot_to_gdp, not_found_countries, gdp_data, store, map_file = _RENDER_STATE
+    gdp_map, no_gdp_data_countries = build_year_map(plot_to_gdp, gdp_data, year, store)
+    filename = map_file.format(year)
+    write_world_map(year, gdp_map, not_found_countries, no_gdp_data_countries, filename)
+    return filename
+
+
+def render_world_maps(gdpinfo, codeinfo, plot_countries, years=None,
+                      map_file="isp_gdp_world_code_{}.svg", processes=None, store=None):
+    """
+    Inputs:
+      gdpinfo        - A GDP information dictionary
+      codeinfo       - A country code information dictionary
+      plot_countries - Dictionary mapping plot library country codes to country names
+      years          - Optional list of string years of data (defaults
+                       to every year from "min_year" to "max_year")
+      map_file       - Output map file name pattern, with {} where the
+                       year goes
+      processes      - Number of worker processes (defaults to the
+                       number of CPUs)
+      store          - Optional GDPStore to build the maps from
+
+    Output:
+      Returns the list of the map file names written, one per year.
+
+    Action:
+      Creates a world map plot of the GDP data for each year, as
+      render_world_map does.  The GDP and country code files are read
+      and the countries reconciled once for all of the years.  The
+      maps are rendered in a pool of forked processes that share the
+      reconciled data; where fork is not available they are rendered
+      one after another instead.
+    """
+    global _RENDER_STATE
+
+    if years is None:
+        years = [str(year) for year in range(int(gdpinfo['min_year']), int(gdpinfo['max_year']) + 1)]
+
+    # Load and reconcile the data once
+    if store is not None:
+        gdp_data = store.codes
+    else:
+        with open(gdpinfo['gdpfile'], 'r') as csvfile:
+            reader = csv.DictReader(csvfile, delimiter=gdpinfo['separator'], quotechar=gdpinfo['quote'])
+            gdp_data = {row[gdpinfo['country_code']].strip(): row for row in reader}
+    plot_to_gdp, not_found_countries = reconcile_countries_by_code(codeinfo, plot_countries, gdp_data)
+
+    _RENDER_STATE = (plot_to_gdp, not_found_countries, gdp_data, store, map_file)
+    try:
+        if processes == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return [_render_year(year) for year in years]
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork')) as executor:
+            return list(executor.map(_render_year, years))
+    finally:
+        _RENDER_STATE = None
+
+
 def test_render_world_map():
     """
     Test the project code for several years
@@ -174,17 +301,9 @@ def test_render_world_map():
     # Get pygal country code map
     pygal_countries = pygal.maps.world.COUNTRIES
 
-    # 1960
-    render_world_map(gdpinfo, codeinfo, pygal_countries, "1960", "isp_gdp_world_code_1960.svg")
-
-    # 1980
-    render_world_map(gdpinfo, codeinfo, pygal_countries, "1980", "isp_gdp_world_code_1980.svg")
-
-    # 2000
-    render_world_map(gdpinfo, codeinfo, pygal_countries, "2000", "isp_gdp_world_code_2000.svg")
-
-    # 2010
-    render_world_map(gdpinfo, codeinfo, pygal_countries, "2010", "isp_gdp_world_code_2010.svg")
+    # 1960, 1980, 2000 and 2010
+    render_world_maps(gdpinfo, codeinfo, pygal_countries, ["1960", "1980", "2000", "2010"],
+                      "isp_gdp_world_code_{}.svg")
 
 
 # Make sure the following call to test_render_world_map is commented
@@ -7,40 +7,186 @@ about the expected behavior of the program.
 """
 
 import csv
+import glob
+import hashlib
+import marshal
+import math
+import os
+import tempfile
 import pygal
 
 
-def read_csv_as_nested_dict(filename, keyfield, separator, quote):
+def read_csv_as_nested_dict(filename, keyfield, separator, quote, cachedir=None,
+                            schema=None):
     """
     Inputs:
       filename  - Name of CSV file
       keyfield  - Field to use as key for rows
       separator - Character that separates fields
       quote     - Character used to optionally quote fields
+      cachedir  - Optional directory for the binary table cache
+      schema    - Optional dictionary mapping field names to the type
+                  (int or float) to convert their values to
 
     Output:
       Returns a dictionary of dictionaries where the outer dictionary
       maps the value in the key_field to the corresponding row in the
       CSV file.  The inner dictionaries map the field names to the
       field values for that row.
+
+      The values of the fields in schema are converted once, as the
+      file is loaded; empty or invalid values become None.
     """
-    result = {}
-    with open(filename, mode='r', newline='') as csvfile:
-        reader = csv.DictReader(csvfile, delimiter=separator, quotechar=quote)
-        for row in reader:
-            key = row[keyfield]
-            result[key] = row
+    if cachedir:
+        fieldnames, rows = read_csv_rows_cached(filename, separator, quote, cachedir)
+        result = {row[keyfield]: row for row in _cached_row_dicts(fieldnames, rows)}
+    else:
+        result = {}
+        with open(filename, mode='r', newline='') as csvfile:
+            reader = csv.DictReader(csvfile, delimiter=separator, quotechar=quote)
+            for row in reader:
+                key = row[keyfield]
+                result[key] = row
+
+    if schema:
+        for row in result.values():
+            for field, fieldtype in schema.items():
+                if field in row:
+                    row[field] = convert_value(row[field], fieldtype)
     return result
 
 
+def convert_value(value, fieldtype):
+    """
+    Inputs:
+      value     - String value from a CSV file (or None)
+      fieldtype - Type to convert the value to (int or float)
+
+    Output:
+      Returns the converted value, or None if the value is empty or
+      cannot be converted.
+    """
+    if not value:
+        return None
+    try:
+        return fieldtype(value)
+    except ValueError:
+        return None
+
+
+# Separates the values of a column in the table cache
+_CACHE_SEPARATOR = "\x00"
+
+
+def _csv_cache_path(cachedir, filename, separator, quote):
+    """
+    Inputs:
+      cachedir  - Directory holding the cached tables
+      filename  - Name of CSV file
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+    Output:
+      Returns a tuple of the name of the cache file for the current
+      contents of filename and the prefix shared by all cache files
+      for that path, separator and quote.
+    """
+    path = os.path.abspath(filename)
+    status = os.stat(path)
+    key = repr((path, status.st_size, status.st_mtime_ns, separator, quote))
+    dialect = repr((path, separator, quote))
+    prefix = os.path.join(cachedir, "{}-{}-".format(
+        os.path.basename(path), hashlib.sha1(dialect.encode()).hexdigest()[:12]))
+    return prefix + hashlib.sha1(key.encode()).hexdigest() + ".cache", prefix
+
+
+def read_csv_rows_cached(filename, separator, quote, cachedir):
+    """
+    Inputs:
+      filename  - Name of CSV file
+      separator - Character that separates fields
+      quote     - Character used to optionally quote fields
+      cachedir  - Directory holding the cached tables
+    Output:
+      Returns a tuple of the list of field names and the list of
+      rows (tuples of strings) in the CSV file, the same rows (blank
+      ones included) that csv.reader would return.
+
+      The parsed table is stored in a binary cache file the first
+      time it is read.  The cache is keyed by the file path, size,
+      modification time, separator and quote character, so any change
+      to the file (or to the dialect) causes it to be parsed again.
+    """
+    cachepath, prefix = _csv_cache_path(cachedir, filename, separator, quote)
+    try:
+        with open(cachepath, 'rb') as cachefile:
+            fieldnames, columns, rows = marshal.load(cachefile)
+        if columns is not None:
+            # Split each column back into its values and rebuild the rows
+            rows = list(zip(*[column.split(_CACHE_SEPARATOR) for column in columns]))
+        return fieldnames, rows
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with open(filename, newline='') as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=separator, quotechar=quote)
+        fieldnames = next(csvreader, [])
+        rows = [tuple(row) for row in csvreader]
+
+    # Store the table column by column, each column as a single string,
+    # unless the table is empty, ragged or contains the column separator
+    columns = None
+    if rows and all(len(row) == len(fieldnames) for row in rows):
+        columns = [_CACHE_SEPARATOR.join(column) for column in zip(*rows)]
+        if len(columns) != len(fieldnames) or any(
+                column.count(_CACHE_SEPARATOR) != len(rows) - 1 for column in columns):
+            columns = None
+
+    # Replace any stale cache for this file and dialect, writing the new
+    # one atomically
+    os.makedirs(cachedir, exist_ok=True)
+    for stalepath in glob.glob(glob.escape(prefix) + "*.cache"):
+        try:
+            os.remove(stalepath)
+        except OSError:
+            pass
+    temppath = "{}.{}.tmp".format(cachepath, os.getpid())
+    with open(temppath, 'wb') as cachefile:
+        marshal.dump((fieldnames, columns, None if columns else rows), cachefile)
+    os.replace(temppath, cachepath)
+    return fieldnames, rows
+
+
+def _cached_row_dicts(fieldnames, rows):
+    """
+    Inputs:
+      fieldnames - List of field names
+      rows       - Iterable of rows read from the table cache
+    Output:
+      Generates the same dictionaries that csv.DictReader would for
+      the given rows: blank rows are skipped, missing fields are None
+      and extra values are listed under the key None.
+    """
+    numfields = len(fieldnames)
+    for row in rows:
+        if not row:
+            continue
+        rowdict = dict(zip(fieldnames, row))
+        if len(row) > numfields:
+            rowdict[None] = list(row[numfields:])
+        for field in fieldnames[len(row):]:
+            rowdict[field] = None
+        yield rowdict
+
+
 def build_plot_values(gdpinfo, gdpdata):
     """
     Inputs:
       gdpinfo - GDP data information dictionary
       gdpdata - A single country's GDP stored in a dictionary whose
                 keys are strings indicating a year and whose values
-                are strings indicating the country's corresponding GDP
-                for that year.
+                are strings (or floats, or None when missing)
+                indicating the country's corresponding GDP for that
+                year.
 
     Output: 
       Returns a list of tuples of the form (year, GDP) for the years
@@ -53,22 +199,26 @@ def build_plot_values(gdpinfo, gdpdata):
     
     plot_values = []
     for year in range(min_year, max_year + 1):
-        year_str = str(year)
-        if year_str in gdpdata and gdpdata[year_str]:
+        gdp = gdpdata.get(str(year))
+        if isinstance(gdp, float):
+            # Already converted when the data was loaded
+            plot_values.append((year, gdp))
+        elif gdp:
             try:
-                gdp = float(gdpdata[year_str])
-                plot_values.append((year, gdp))
+                plot_values.append((year, float(gdp)))
             except ValueError:
                 continue  # Skip if the GDP value is not a valid float
     
     return plot_values
 
 
-def build_plot_dict(gdpinfo, country_list):
+def build_plot_dict(gdpinfo, country_list, store=None):
     """
     Inputs:
       gdpinfo      - GDP data information dictionary
       country_list - List of strings that are country names
+      store        - Optional GDPStore (see isp_gdp_store) already
+                     loaded from the CSV file described by gdpinfo
 
     Output:
       Returns a dictionary whose keys are the country names in
@@ -79,11 +229,32 @@ def build_plot_dict(gdpinfo, country_list):
       CSV file should still be in the output dictionary, but
       with an empty XY plot value list.
     """
-    # Read the CSV file into a nested dictionary
+    if store is not None:
+        # Each country's values are a slice of the store
+        min_year = int(gdpinfo['min_year'])
+        max_year = int(gdpinfo['max_year'])
+        plot_dict = {}
+        for country in country_list:
+            row = store.names.get(country)
+            if row is None:
+                plot_dict[country] = []
+            else:
+                plot_dict[country] = [(year, gdp) for year, gdp
+                                      in zip(store.years, store.series(row))
+                                      if min_year <= year <= max_year
+                                      and not math.isnan(gdp)]
+        return plot_dict
+
+    # Read the CSV file into a nested dictionary, converting the GDP
+    # values for the years of interest to floats once
+    schema = {str(year): float
+              for year in range(int(gdpinfo['min_year']), int(gdpinfo['max_year']) + 1)}
     gdp_data = read_csv_as_nested_dict(gdpinfo['gdpfile'], 
                                        gdpinfo['country_name'], 
                                        gdpinfo['separator'], 
-                                       gdpinfo['quote'])
+                                       gdpinfo['quote'],
+                                       gdpinfo.get('cachedir'),
+                                       schema)
 
     plot_dict = {}
     for country in country_list:
@@ -95,12 +266,13 @@ def build_plot_dict(gdpinfo, country_list):
     return plot_dict
 
 
-def render_xy_plot(gdpinfo, country_list, plot_file):
+def render_xy_plot(gdpinfo, country_list, plot_file, store=None):
     """
     Inputs:
       gdpinfo      - GDP data information dictionary
       country_list - List of strings that are country names
       plot_file    - String that is the output plot file name
+      store        - Optional GDPStore to build the plot from
 
     Output:
       Returns None.
@@ -111,7 +283,7 @@ def render_xy_plot(gdpinfo, country_list, plot_file):
       The image will be stored in a file named by plot_file.
     """
     # Build the plot dictionary using previously defined function
-    plot_dict = build_plot_dict(gdpinfo, country_list)
+    plot_dict = build_plot_dict(gdpinfo, country_list, store)
     
     # Create a XY chart using Pygal
     xy_chart = pygal.XY(stroke=False)
@@ -127,6 +299,28 @@ def render_xy_plot(gdpinfo, country_list, plot_file):
     xy_chart.render_to_file(plot_file)
 
 
+def test_read_csv_rows_cached():
+    """
+    Checks that read_csv_as_nested_dict gives the same table with and
+    without the table cache, for a file with blank, short and long
+    rows, and that reading one file with two dialects keeps a cache
+    file for each.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "ragged.csv")
+        with open(filename, 'w', newline='') as csvfile:
+            csvfile.write('id,a,b\r\n1,x,y\r\n\r\n2,x\r\n3,x,y,z\r\n')
+        cachedir = os.path.join(directory, "cache")
+
+        # The first pass fills the cache and the second reads it
+        for _ in range(2):
+            assert (read_csv_as_nested_dict(filename, 'id', ',', '"', cachedir) ==
+                    read_csv_as_nested_dict(filename, 'id', ',', '"'))
+
+        read_csv_rows_cached(filename, ';', '"', cachedir)
+        assert len(os.listdir(cachedir)) == 2
+
+
 def test_render_xy_plot():
     """
     Code to exercise render_xy_plot and generate plots from
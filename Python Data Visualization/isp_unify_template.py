@@ -8,7 +8,9 @@ about the expected behavior of the program.
 
 import csv
 import math
+import multiprocessing
 import pygal
+from concurrent.futures import ProcessPoolExecutor
 
 
 def reconcile_countries_by_name(plot_countries, gdp_countries):
@@ -36,13 +38,15 @@ def reconcile_countries_by_name(plot_countries, gdp_countries):
     return country_code_to_name, not_found_codes
 
 
-def build_map_dict_by_name(gdpinfo, plot_countries, year):
+def build_map_dict_by_name(gdpinfo, plot_countries, year, store=None):
     """
     Inputs:
       gdpinfo        - A GDP information dictionary
       plot_countries - Dictionary whose keys are plot library country codes
                        and values are the corresponding country name
       year           - String year to create GDP mapping for
+      store          - Optional GDPStore (see isp_gdp_store) already
+                       loaded from the GDP file described by gdpinfo
 
     Output:
       A tuple containing a dictionary and two sets.  The dictionary
@@ -53,21 +57,56 @@ def build_map_dict_by_name(gdpinfo, plot_countries, year):
       codes from plot_countries that were found in the GDP data file, but
       have no GDP data for the specified year.
     """
-    gdp_map = {}
-    not_found_countries = set()
-    no_gdp_data_countries = set()
-    
-    try:
-        with open(gdpinfo['gdpfile'], 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=gdpinfo['separator'], quotechar=gdpinfo['quote'])
-            gdp_countries = {row[gdpinfo['country_name']].strip(): row for row in reader}
-    except KeyError as e:
-        raise KeyError(f"CSV file does not contain the column: {e}")
+    if store is not None:
+        # Map the stripped country names to rows of the store
+        gdp_countries = store.stripped_names
+    else:
+        try:
+            with open(gdpinfo['gdpfile'], 'r', newline='', encoding='utf-8') as csvfile:
+                reader = csv.DictReader(csvfile, delimiter=gdpinfo['separator'], quotechar=gdpinfo['quote'])
+                gdp_countries = {row[gdpinfo['country_name']].strip(): row for row in reader}
+        except KeyError as e:
+            raise KeyError(f"CSV file does not contain the column: {e}")
 
     plot_to_gdp_country, not_found_countries = reconcile_countries_by_name(plot_countries, gdp_countries)
     
+    gdp_map, no_gdp_data_countries = build_year_map(plot_to_gdp_country, gdp_countries, year, store)
+    
+    return gdp_map, not_found_countries, no_gdp_data_countries
+
+
+def build_year_map(plot_to_gdp_country, gdp_countries, year, store=None):
+    """
+    Inputs:
+      plot_to_gdp_country - Dictionary mapping plot library country codes
+                            to GDP country names (from
+                            reconcile_countries_by_name)
+      gdp_countries       - Dictionary mapping GDP country names to the
+                            rows of the GDP file, or to row numbers of
+                            store
+      year                - String year to create GDP mapping for
+      store               - Optional GDPStore that gdp_countries refers to
+
+    Output:
+      A tuple containing a dictionary and a set.  The dictionary maps
+      country codes from plot_to_gdp_country to the log (base 10) of
+      the GDP value for that country in the specified year.  The set
+      contains the country codes from plot_to_gdp_country that have no
+      GDP data for the specified year.
+    """
+    gdp_map = {}
+    no_gdp_data_countries = set()
+
+    # The values for the year are one slice of the store
+    year_values = store.cross_section(year) if store is not None else None
+
     for code, country_name in plot_to_gdp_country.items():
-        gdp_value = gdp_countries[country_name].get(year, '')
+        if store is None:
+            gdp_value = gdp_countries[country_name].get(year, '')
+        elif year_values is None or math.isnan(year_values[gdp_countries[country_name]]):
+            gdp_value = None
+        else:
+            gdp_value = year_values[gdp_countries[country_name]]
         if gdp_value:
             try:
                 gdp_map[code] = math.log10(float(gdp_value))
@@ -76,10 +115,10 @@ def build_map_dict_by_name(gdpinfo, plot_countries, year):
         else:
             no_gdp_data_countries.add(code)
     
-    return gdp_map, not_found_countries, no_gdp_data_countries
+    return gdp_map, no_gdp_data_countries
 
 
-def render_world_map(gdpinfo, plot_countries, year, map_file):
+def render_world_map(gdpinfo, plot_countries, year, map_file, store=None):
     """
     Inputs:
       gdpinfo        - A GDP information dictionary
@@ -87,6 +126,7 @@ def render_world_map(gdpinfo, plot_countries, year, map_file):
                        and values are the corresponding country name
       year           - String year to create GDP mapping for
       map_file       - Name of output file to create
+      store          - Optional GDPStore to build the map from
 
     Output:
       Returns None.
@@ -96,8 +136,30 @@ def render_world_map(gdpinfo, plot_countries, year, map_file):
       writes it to a file named by map_file.
     """
     # Get the GDP data
-    gdp_map, not_found_countries, no_gdp_data_countries = build_map_dict_by_name(gdpinfo, plot_countries, year)
+    gdp_map, not_found_countries, no_gdp_data_countries = build_map_dict_by_name(gdpinfo, plot_countries, year, store)
+
+    write_world_map(year, gdp_map, not_found_countries, no_gdp_data_countries, map_file)
+
 
+def write_world_map(year, gdp_map, not_found_countries, no_gdp_data_countries, map_file):
+    """
+    Inputs:
+      year                  - String year of data
+      gdp_map               - Dictionary mapping plot library country
+                              codes to the log (base 10) of their GDP
+      not_found_countries   - Set of plot library country codes missing
+                              from the GDP data
+      no_gdp_data_countries - Set of plot library country codes with no
+                              GDP data for the year
+      map_file              - Name of output file to create
+
+    Output:
+      Returns None.
+
+    Action:
+      Creates a world map plot of the GDP data in gdp_map and writes
+      it to a file named by map_file.
+    """
     # Create a world map
     worldmap_chart = pygal.maps.world.World()
     worldmap_chart.title = f'World GDP in {year}'
@@ -111,6 +173,77 @@ def render_world_map(gdpinfo, plot_countries, year, map_file):
     worldmap_chart.render_to_file(map_file)
 
 
+# Reconciled data for _render_year, set by render_world_maps
+_RENDER_STATE = None
+
+def _render_year(year):
+    """
+    Inputs:
+      year - String year to create GDP mapping for
+    Output:
+      Returns the name of the map file written for the year.
+    """
+    plot_to_gdp_country, not_found_countries, gdp_countries, store, map_file = _RENDER_STATE
+    gdp_map, no_gdp_data_countries = build_year_map(plot_to_gdp_country, gdp_countries, year, store)
+    filename = map_file.format(year)
+    write_world_map(year, gdp_map, not_found_countries, no_gdp_data_countries, filename)
+    return filename
+
+
+def render_world_maps(gdpinfo, plot_countries, years=None,
+                      map_file="isp_gdp_world_name_{}.svg", processes=None, store=None):
+    """
+    Inputs:
+      gdpinfo        - A GDP information dictionary
+      plot_countries - Dictionary whose keys are plot library country codes
+                       and values are the corresponding country name
+      years          - Optional list of string years to create GDP
+                       mappings for (defaults to every year from
+                       "min_year" to "max_year")
+      map_file       - Output file name pattern, with {} where the year
+                       goes
+      processes      - Number of worker processes (defaults to the
+                       number of CPUs)
+      store          - Optional GDPStore to build the maps from
+
+    Output:
+      Returns the list of the map file names written, one per year.
+
+    Action:
+      Creates a world map plot of the GDP data for each year, as
+      render_world_map does.  The GDP file is read and the countries
+      reconciled once for all of the years.  The maps are rendered in
+      a pool of forked processes that share the reconciled data; where
+      fork is not available they are rendered one after another
+      instead.
+    """
+    global _RENDER_STATE
+
+    if years is None:
+        years = [str(year) for year in range(int(gdpinfo['min_year']), int(gdpinfo['max_year']) + 1)]
+
+    # Load and reconcile the data once
+    if store is not None:
+        gdp_countries = store.stripped_names
+    else:
+        try:
+            with open(gdpinfo['gdpfile'], 'r', newline='', encoding='utf-8') as csvfile:
+                reader = csv.DictReader(csvfile, delimiter=gdpinfo['separator'], quotechar=gdpinfo['quote'])
+                gdp_countries = {row[gdpinfo['country_name']].strip(): row for row in reader}
+        except KeyError as e:
+            raise KeyError(f"CSV file does not contain the column: {e}")
+    plot_to_gdp_country, not_found_countries = reconcile_countries_by_name(plot_countries, gdp_countries)
+
+    _RENDER_STATE = (plot_to_gdp_country, not_found_countries, gdp_countries, store, map_file)
+    try:
+        if processes == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return [_render_year(year) for year in years]
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork')) as executor:
+            return list(executor.map(_render_year, years))
+    finally:
+        _RENDER_STATE = None
+
+
 def test_render_world_map():
     """
     Test the project code for several years.
@@ -128,17 +261,9 @@ def test_render_world_map():
     # Get pygal country code map
     pygal_countries = pygal.maps.world.COUNTRIES
 
-    # 1960
-    render_world_map(gdpinfo, pygal_countries, "1960", "isp_gdp_world_name_1960.svg")
-
-    # 1980
-    render_world_map(gdpinfo, pygal_countries, "1980", "isp_gdp_world_name_1980.svg")
-
-    # 2000
-    render_world_map(gdpinfo, pygal_countries, "2000", "isp_gdp_world_name_2000.svg")
-
-    # 2010
-    render_world_map(gdpinfo, pygal_countries, "2010", "isp_gdp_world_name_2010.svg")
+    # 1960, 1980, 2000 and 2010
+    render_world_maps(gdpinfo, pygal_countries, ["1960", "1980", "2000", "2010"],
+                      "isp_gdp_world_name_{}.svg")
 
 
 # Make sure the following call to test_render_world_map is commented
@@ -0,0 +1,492 @@
+"""
+Benchmark suite for the project modules.
+
+Generates synthetic batting, master, GDP, country code and text files
+at the requested scales, times the public entry points of the
+project modules on them and writes the results to a JSON file, so
+that runs can be compared with each other.
+
+Usage:
+  python isp_benchmarks.py --rows 10000 100000 --output benchmarks.json
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Module name -> path of each project module, relative to ROOT
+MODULES = {
+    "isp_csvfiles_template": "Python Data Analysis/isp_csvfiles_template.py",
+    "isp_baseball_template": "Python Data Analysis/isp_baseball_template.py",
+    "isp_diff_template": "Python Data Representations/isp_diff_template.py",
+    "isp_plot_template": "Python Data Visualization/isp_plot_template.py",
+    "isp_unify_template": "Python Data Visualization/isp_unify_template.py",
+    "isp_maps_template": "Python Data Visualization/isp_maps_template.py",
+    "isp_gdp_store": "Python Data Visualization/isp_gdp_store.py",
+}
+
+# Module name -> names of the module-level caches that keep data
+# between calls, cleared before each timed run
+CACHES = {
+    "isp_baseball_template": ["_PLAYER_DIRECTORIES"],
+}
+
+FIRST_YEAR = 1871
+LAST_YEAR = 2016
+GDP_YEARS = range(1960, 2016)
+
+
+##
+## Synthetic data generators
+##
+
+def generate_master(filename, numplayers, rng):
+    """
+    Inputs:
+      filename   - name of CSV file to write
+      numplayers - number of players
+      rng        - random.Random instance
+    Output:
+      Writes a master file with numplayers rows in the format of
+      Master_2016.csv (only the columns used by the project).
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["playerID", "birthYear", "nameFirst", "nameLast"])
+        for index in range(numplayers):
+            writer.writerow(["p{:07d}".format(index), rng.randint(1850, 1995),
+                             "First{}".format(index % 997), "Last{}".format(index)])
+
+
+def generate_batting(filename, numrows, numplayers, rng):
+    """
+    Inputs:
+      filename   - name of CSV file to write
+      numrows    - number of rows
+      numplayers - number of distinct players (as in generate_master)
+      rng        - random.Random instance
+    Output:
+      Writes a batting file with numrows rows in the format of
+      Batting_2016.csv (only the columns used by the project).
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["playerID", "yearID", "AB", "H", "2B", "3B", "HR", "BB"])
+        for _ in range(numrows):
+            at_bats = rng.randint(0, 650)
+            hits = rng.randint(0, at_bats // 3)
+            doubles = rng.randint(0, hits // 4)
+            triples = rng.randint(0, hits // 10)
+            home_runs = rng.randint(0, (hits - doubles - triples) // 3)
+            writer.writerow(["p{:07d}".format(rng.randrange(numplayers)),
+                             rng.randint(FIRST_YEAR, LAST_YEAR), at_bats, hits,
+                             doubles, triples, home_runs, rng.randint(0, 100)])
+
+
+def generate_gdp(filename, numcountries, rng):
+    """
+    Inputs:
+      filename     - name of CSV file to write
+      numcountries - number of countries
+      rng          - random.Random instance
+    Output:
+      Writes a GDP file with numcountries rows in the format of
+      isp_gdp.csv, with about one value in ten missing.
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Country Name", "Country Code", "Indicator Name",
+                         "Indicator Code"] + [str(year) for year in GDP_YEARS])
+        for index in range(numcountries):
+            values = ["" if rng.random() < 0.1 else "{:.6g}".format(rng.uniform(1e7, 1e13))
+                      for _ in GDP_YEARS]
+            writer.writerow(["Country {}".format(index), "C{:05d}".format(index),
+                             "GDP (current US$)", "NY.GDP.MKTP.CD"] + values)
+
+
+def plot_countries_for(numcountries):
+    """
+    Inputs:
+      numcountries - number of countries (as in generate_gdp)
+    Output:
+      Returns the plot countries dictionary mapping plot codes to
+      country names.  One plot country in ten has no GDP data.
+    """
+    return {"c{}".format(index): "Country {}".format(index)
+            for index in range(numcountries + numcountries // 10)}
+
+
+def generate_country_codes(filename, plot_countries):
+    """
+    Inputs:
+      filename       - name of CSV file to write
+      plot_countries - dictionary from plot_countries_for
+    Output:
+      Writes a country code file in the format of isp_country_codes.csv
+      (only the columns used by the project) for the plot countries.
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["name", "ISO3166-1-Alpha-2", "ISO3166-1-Alpha-3"])
+        for index, (plot_code, name) in enumerate(plot_countries.items()):
+            writer.writerow([name, plot_code.upper(), "C{:05d}".format(index)])
+
+
+def generate_text_pair(filename1, filename2, numlines, rng):
+    """
+    Inputs:
+      filename1 - name of first text file to write
+      filename2 - name of second text file to write
+      numlines  - number of lines in each file
+      rng       - random.Random instance
+    Output:
+      Writes two text files of numlines lines that only differ in a
+      single character of their last line.
+    """
+    with open(filename1, 'w') as file1, open(filename2, 'w') as file2:
+        for index in range(numlines):
+            line = "{} {}\n".format(index, "x" * rng.randint(20, 120))
+            file1.write(line)
+            if index == numlines - 1:
+                line = line[:-2] + "y\n"
+            file2.write(line)
+
+
+##
+## Benchmarks
+##
+
+def load_module(name):
+    """
+    Inputs:
+      name - name of a project module in MODULES
+    Output:
+      Returns the imported module.  It is also added to sys.modules,
+      so that its functions can be sent to worker processes.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, MODULES[name]))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def clear_caches(module):
+    """
+    Inputs:
+      module - project module
+    Output:
+      Empties the module-level caches of the module listed in CACHES,
+      so that the next call starts cold.
+    """
+    for cache in CACHES.get(module.__name__, ()):
+        getattr(module, cache).clear()
+
+
+def best_time(function, repeat, reset=None):
+    """
+    Inputs:
+      function - function of no arguments to time
+      repeat   - number of times to call it
+      reset    - optional function of no arguments called (untimed)
+                 before each call
+    Output:
+      Returns the shortest time in seconds taken by a call.
+    """
+    best = None
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def build_benchmarks(directory, numrows, seed, only=None):
+    """
+    Inputs:
+      directory - directory to write the synthetic data to
+      numrows   - number of rows in the main table of each benchmark
+      seed      - random seed for the synthetic data
+      only      - optional list of benchmark names to build
+    Output:
+      Returns a list of (benchmark name, module name, prepare) tuples,
+      after writing the synthetic files those benchmarks read.  Called
+      with the module, prepare does any untimed setup (loading a
+      table, filling a cache) and returns the function of no arguments
+      to time.  It raises ImportError if the benchmark needs a package
+      that is not installed.
+
+      Each opt-in fast path is timed next to the default call it is
+      meant to speed up, under the same name followed by "/" and the
+      option.
+    """
+    numplayers = max(1, numrows // 5)
+    path = lambda name: os.path.join(directory, name)
+
+    baseballinfo = {"masterfile": path("master.csv"), "battingfile": path("batting.csv"),
+                    "separator": ",", "quote": '"', "playerid": "playerID",
+                    "firstname": "nameFirst", "lastname": "nameLast",
+                    "yearid": "yearID", "atbats": "AB", "hits": "H",
+                    "doubles": "2B", "triples": "3B", "homeruns": "HR",
+                    "walks": "BB", "battingfields": ["AB", "H", "2B", "3B", "HR", "BB"]}
+    cachedinfo = dict(baseballinfo, cachedir=path("cache"))
+    gdpinfo = {"gdpfile": path("gdp.csv"), "separator": ",", "quote": '"',
+               "min_year": GDP_YEARS[0], "max_year": GDP_YEARS[-1],
+               "country_name": "Country Name", "country_code": "Country Code"}
+    cachedgdpinfo = dict(gdpinfo, cachedir=path("cache"))
+    codeinfo = {"codefile": path("codes.csv"), "separator": ",", "quote": '"',
+                "plot_codes": "ISO3166-1-Alpha-2", "data_codes": "ISO3166-1-Alpha-3"}
+    gdpfile, text1, text2 = path("gdp.csv"), path("text1.txt"), path("text2.txt")
+    textpairs = [(text1, text2)] * 4
+
+    # Setup functions, called untimed with the module; the benchmark
+    # is then called with the module and what its setup returned
+    def filled(setup=None):
+        # Also runs the benchmark once untimed, to fill its cache
+        def setup_filled(module):
+            return setup(module) if setup is not None else None
+        setup_filled.fill = True
+        return setup_filled
+
+    def batting_table(module):
+        return module.BattingTable(baseballinfo)
+
+    def numpy_batting_table(module):
+        if module.numpy is None:
+            raise ImportError("No module named 'numpy'")
+        return module.BattingTable(baseballinfo)
+
+    def career_stats(module):
+        career = module.CareerStats(baseballinfo["playerid"], baseballinfo["battingfields"])
+        career.update_from_file(baseballinfo)
+        return career
+
+    def queries(module):
+        return [(module.batting_average, 10, 2000), (module.onbase_percentage, 10, 2001),
+                (module.slugging_percentage, 10, 2002), (module.batting_average, 10, None),
+                (module.onbase_percentage, 10, None)]
+
+    def run_queries(module, _):
+        for formula, count, year in queries(module):
+            if year is None:
+                module.compute_top_stats_career(baseballinfo, formula, count)
+            else:
+                module.compute_top_stats_year(baseballinfo, formula, count, year)
+
+    # Built only by the benchmarks that use them, as they grow with numrows
+    def country_list(_):
+        return ["Country {}".format(index) for index in range(0, numrows, 10)]
+
+    def plot_countries(_):
+        return plot_countries_for(numrows)
+
+    def with_store(setup):
+        return lambda module: (setup(module), load_module("isp_gdp_store").GDPStore(gdpinfo))
+
+    # Each benchmark, with the synthetic data sets it reads
+    benchmarks = [
+        ("compute_top_stats_year", "isp_baseball_template", ["baseball"], None,
+         lambda module, _: module.compute_top_stats_year(
+             baseballinfo, module.batting_average, 10, 2000)),
+        ("compute_top_stats_year/cachedir", "isp_baseball_template", ["baseball"], filled(),
+         lambda module, _: module.compute_top_stats_year(
+             cachedinfo, module.batting_average, 10, 2000)),
+        ("compute_top_stats_year/table", "isp_baseball_template", ["baseball"], batting_table,
+         lambda module, table: module.compute_top_stats_year(
+             baseballinfo, module.batting_average, 10, 2000, table)),
+        ("compute_top_stats_year/vectorized", "isp_baseball_template", ["baseball"],
+         numpy_batting_table,
+         lambda module, table: module.compute_top_stats_year(
+             baseballinfo, module.batting_average, 10, 2000, table, vectorized=True)),
+        ("compute_top_stats_career", "isp_baseball_template", ["baseball"], None,
+         lambda module, _: module.compute_top_stats_career(
+             baseballinfo, module.batting_average, 10)),
+        ("compute_top_stats_career/cachedir", "isp_baseball_template", ["baseball"], filled(),
+         lambda module, _: module.compute_top_stats_career(
+             cachedinfo, module.batting_average, 10)),
+        ("compute_top_stats_career/table", "isp_baseball_template", ["baseball"], batting_table,
+         lambda module, table: module.compute_top_stats_career(
+             baseballinfo, module.batting_average, 10, table)),
+        ("compute_top_stats_career/vectorized", "isp_baseball_template", ["baseball"],
+         numpy_batting_table,
+         lambda module, table: module.compute_top_stats_career(
+             baseballinfo, module.batting_average, 10, table, vectorized=True)),
+        ("compute_top_stats_career/career", "isp_baseball_template", ["baseball"], career_stats,
+         lambda module, career: module.compute_top_stats_career(
+             baseballinfo, module.batting_average, 10, career=career)),
+        ("top_stats_queries", "isp_baseball_template", ["baseball"], None, run_queries),
+        ("top_stats_queries/batch", "isp_baseball_template", ["baseball"], None,
+         lambda module, _: module.compute_top_stats_batch(
+             baseballinfo, queries(module), processes=1)),
+        ("top_stats_queries/processes", "isp_baseball_template", ["baseball"], None,
+         lambda module, _: module.compute_top_stats_batch(baseballinfo, queries(module))),
+        ("top_stats_queries/vectorized", "isp_baseball_template", ["baseball"],
+         numpy_batting_table,
+         lambda module, _: module.compute_top_stats_batch(
+             baseballinfo, queries(module), processes=1, vectorized=True)),
+        ("read_csv_as_nested_dict", "isp_csvfiles_template", ["gdp"], None,
+         lambda module, _: module.read_csv_as_nested_dict(gdpfile, "Country Code", ",", '"')),
+        ("read_csv_as_nested_dict/cachedir", "isp_csvfiles_template", ["gdp"], filled(),
+         lambda module, _: module.read_csv_as_nested_dict(
+             gdpfile, "Country Code", ",", '"', cachedir=path("cache"))),
+        ("read_csv_as_nested_dict/processes", "isp_csvfiles_template", ["gdp"], None,
+         lambda module, _: module.read_csv_as_nested_dict(
+             gdpfile, "Country Code", ",", '"', processes=os.cpu_count())),
+        ("file_diff_format", "isp_diff_template", ["text"], None,
+         lambda module, _: module.file_diff_format(text1, text2)),
+        ("file_diff_format/edit_script", "isp_diff_template", ["text"], None,
+         lambda module, _: "".join(module.file_edit_script_format(text1, text2))),
+        ("multiline_diff_many", "isp_diff_template", ["text"], None,
+         lambda module, _: [module.multiline_diff(module.get_file_lines(filename1),
+                                                  module.get_file_lines(filename2))
+                            for filename1, filename2 in textpairs]),
+        ("multiline_diff_many/fan_out", "isp_diff_template", ["text"], None,
+         lambda module, _: list(module.fan_out_diff(text1, [text2 for _, text2 in textpairs]))),
+        ("file_diff_format_many", "isp_diff_template", ["text"], None,
+         lambda module, _: [module.file_diff_format(*pair) for pair in textpairs]),
+        ("file_diff_format_many/batch", "isp_diff_template", ["text"], None,
+         lambda module, _: list(module.batch_file_diff(textpairs))),
+        ("file_diff_format_many/cachefile", "isp_diff_template", ["text"], filled(),
+         lambda module, _: list(module.batch_file_diff(textpairs, path("diffcache.json")))),
+        ("build_plot_dict", "isp_plot_template", ["gdp"], country_list,
+         lambda module, countries: module.build_plot_dict(gdpinfo, countries)),
+        ("build_plot_dict/cachedir", "isp_plot_template", ["gdp"], filled(country_list),
+         lambda module, countries: module.build_plot_dict(cachedgdpinfo, countries)),
+        ("build_plot_dict/store", "isp_plot_template", ["gdp"], with_store(country_list),
+         lambda module, state: module.build_plot_dict(gdpinfo, *state)),
+        ("build_map_dict_by_name", "isp_unify_template", ["gdp"], plot_countries,
+         lambda module, countries: module.build_map_dict_by_name(gdpinfo, countries, "2000")),
+        ("build_map_dict_by_name/store", "isp_unify_template", ["gdp"],
+         with_store(plot_countries),
+         lambda module, state: module.build_map_dict_by_name(
+             gdpinfo, state[0], "2000", state[1])),
+        ("build_map_dict_by_code", "isp_maps_template", ["gdp", "codes"], plot_countries,
+         lambda module, countries: module.build_map_dict_by_code(
+             gdpinfo, codeinfo, countries, "2000")),
+        ("build_map_dict_by_code/store", "isp_maps_template", ["gdp", "codes"],
+         with_store(plot_countries),
+         lambda module, state: module.build_map_dict_by_code(
+             gdpinfo, codeinfo, state[0], "2000", state[1])),
+    ]
+    if only:
+        benchmarks = [benchmark for benchmark in benchmarks if benchmark[0] in only]
+
+    # Each data set has its own random stream, so that it is the same
+    # whichever benchmarks are selected
+    datasets = {dataset for benchmark in benchmarks for dataset in benchmark[2]}
+    rng = lambda dataset: random.Random("{}:{}".format(seed, dataset))
+    if "baseball" in datasets:
+        generate_master(path("master.csv"), numplayers, rng("master"))
+        generate_batting(path("batting.csv"), numrows, numplayers, rng("batting"))
+    if "gdp" in datasets:
+        generate_gdp(gdpfile, numrows, rng("gdp"))
+    if "codes" in datasets:
+        generate_country_codes(path("codes.csv"), plot_countries_for(numrows))
+    if "text" in datasets:
+        generate_text_pair(text1, text2, numrows, rng("text"))
+
+    def prepare(setup, function):
+        def prepare_module(module):
+            state = setup(module) if setup is not None else None
+            if getattr(setup, 'fill', False):
+                function(module, state)
+            return lambda: function(module, state)
+        return prepare_module
+
+    return [(name, module_name, prepare(setup, function))
+            for name, module_name, _, setup, function in benchmarks]
+
+
+def run_benchmarks(scales, repeat=3, seed=0, only=None):
+    """
+    Inputs:
+      scales - list of numbers of rows to run the benchmarks at
+      repeat - number of times to run each benchmark
+      seed   - random seed for the synthetic data
+      only   - optional list of benchmark names to run
+    Output:
+      Returns a dictionary describing the run, with one result per
+      benchmark and scale under "results".  Benchmarks whose module
+      or packages cannot be imported (for example, without pygal or
+      NumPy) are reported as skipped.
+    """
+    modules = {}
+    for name in MODULES:
+        try:
+            modules[name] = load_module(name)
+        except ImportError as error:
+            modules[name] = error
+
+    results = []
+    for numrows in scales:
+        with tempfile.TemporaryDirectory() as directory:
+            for benchmark, module_name, prepare in build_benchmarks(directory, numrows,
+                                                                    seed, only):
+                result = {"benchmark": benchmark, "rows": numrows}
+                module = modules[module_name]
+                try:
+                    if isinstance(module, ImportError):
+                        raise module
+                    function = prepare(module)
+                except ImportError as error:
+                    result["skipped"] = str(error)
+                else:
+                    result["seconds"] = best_time(function, repeat,
+                                                  lambda: clear_caches(module))
+                    del function
+                results.append(result)
+                print("{benchmark:<36} {rows:>10} {0}".format(
+                    "{:.4f}s".format(result["seconds"]) if "seconds" in result
+                    else "skipped", **result), file=sys.stderr)
+
+    return {"python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+            "seed": seed,
+            "results": results}
+
+
+def main():
+    """
+    Runs the benchmarks with the command line options and writes the
+    results to the output file.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000],
+                        help="numbers of rows to generate (default: 10000)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of runs of each benchmark (default: 3)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for the synthetic data (default: 0)")
+    parser.add_argument("--only", nargs="+", help="names of the benchmarks to run")
+    parser.add_argument("--output", default="benchmarks.json",
+                        help="JSON file to write (default: benchmarks.json)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.rows, args.repeat, args.seed, args.only)
+    with open(args.output, 'w') as jsonfile:
+        json.dump(report, jsonfile, indent=2)
+        jsonfile.write("\n")
+
+
+if __name__ == '__main__':
+    main()
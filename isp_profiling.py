@@ -0,0 +1,211 @@
+"""
+Opt-in timing instrumentation for the project modules.
+
+Records the wall time, CPU time, row counts and (optionally) peak
+memory of each stage of the load -> compute -> render pipeline and
+reports them as a dictionary or JSON.  Stages can be timed with a
+context manager or a decorator, or the functions of an already
+imported project module can be instrumented in place.
+"""
+
+import contextlib
+import functools
+import json
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Stage recorded for each of the project functions by Profiler.instrument
+# ("Class.method" for methods).  Stages nest (for example, "svg render"
+# includes the time spent building the map data), so the times of a stage
+# include those of its callees.  The batch formulas are evaluated (and
+# their results sorted) inside top_player_ids_batch.
+DEFAULT_STAGES = {
+    "read_csv_as_list_dict": "csv read",
+    "read_csv_as_nested_dict": "csv read",
+    "build_country_code_converter": "csv read",
+    "get_gdp_store": "csv read",
+    "BattingTable.__init__": "csv read",
+    "PlayerDirectory.load": "csv read",
+    "filter_by_year": "filter",
+    "aggregate_by_player_id": "aggregate",
+    "batting_average": "formula",
+    "onbase_percentage": "formula",
+    "slugging_percentage": "formula",
+    "top_player_ids_batch": "formula",
+    "top_player_ids": "sort",
+    "lookup_player_names": "name lookup",
+    "compute_top_stats_year": "compute",
+    "compute_top_stats_career": "compute",
+    "build_plot_dict": "build",
+    "build_map_dict_by_name": "build",
+    "build_map_dict_by_code": "build",
+    "render_xy_plot": "svg render",
+    "render_world_map": "svg render",
+    "render_world_maps": "svg render",
+}
+
+
+class Profiler:
+    """
+    Collects timing statistics for named pipeline stages.
+    """
+
+    def __init__(self, trace_memory=False):
+        """
+        Inputs:
+          trace_memory - if True, also record the peak memory allocated
+                         during each stage with tracemalloc (slower)
+        """
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._patched = []
+        self._peaks = []
+        self._started_tracing = False
+
+    def _record(self, name):
+        """
+        Returns the statistics dictionary for the stage called name.
+        """
+        if name not in self.stages:
+            self.stages[name] = {"calls": 0, "wall_time": 0.0, "cpu_time": 0.0,
+                                 "rows": 0, "peak_memory": None}
+        return self.stages[name]
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Inputs:
+          name - name of the stage
+        Output:
+          Context manager that times its body as one call of the stage.
+          It yields the statistics dictionary of the stage, so the body
+          can add to its "rows" count.
+        """
+        record = self._record(name)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(current)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record["calls"] += 1
+            record["wall_time"] += time.perf_counter() - start_wall
+            record["cpu_time"] += time.process_time() - start_cpu
+            if self.trace_memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["peak_memory"] = max(record["peak_memory"] or 0, peak - current)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+
+    def profile(self, name):
+        """
+        Inputs:
+          name - name of the stage
+        Output:
+          Decorator that times each call of the decorated function as
+          one call of the stage.  If the function returns a list,
+          dictionary or other sized value, its length is added to the
+          "rows" count of the stage.
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name) as record:
+                    result = function(*args, **kwargs)
+                    if hasattr(result, '__len__'):
+                        record["rows"] += len(result)
+                    return result
+            wrapper.profiler_stage = name
+            return wrapper
+        return decorator
+
+    def instrument(self, module, stages=None):
+        """
+        Inputs:
+          module - imported project module (for example
+                   isp_baseball_template)
+          stages - optional dictionary mapping function names (or
+                   "Class.method" names) to stage names (defaults to
+                   DEFAULT_STAGES)
+        Output:
+          Returns the profiler.
+
+          Replaces the functions and methods of module named in stages
+          with profiled versions, so that calls between the module's
+          own functions are recorded as well.  The originals are put
+          back by restore, or when the profiler is used as a context
+          manager and the with block ends.  The profiled versions keep
+          the original in __wrapped__.
+        """
+        if stages is None:
+            stages = DEFAULT_STAGES
+        for function_name, stage_name in stages.items():
+            owner = module
+            *owner_names, attribute = function_name.split(".")
+            for owner_name in owner_names:
+                owner = getattr(owner, owner_name, None)
+            function = getattr(owner, attribute, None)
+            if function is None or hasattr(function, 'profiler_stage'):
+                continue
+            self._patched.append((owner, attribute, function))
+            setattr(owner, attribute, self.profile(stage_name)(function))
+        return self
+
+    def restore(self):
+        """
+        Puts back the functions replaced by instrument, and stops
+        tracemalloc if the profiler started it.
+        """
+        while self._patched:
+            owner, attribute, function = self._patched.pop()
+            setattr(owner, attribute, function)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.restore()
+
+    def report(self):
+        """
+        Output:
+          Returns a dictionary with the statistics of each stage under
+          "stages" and the peak resident set size of the process (in
+          kilobytes, where available) under "max_rss_kb".
+        """
+        max_rss = None
+        if resource is not None:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"stages": {name: dict(record) for name, record in self.stages.items()},
+                "max_rss_kb": max_rss}
+
+    def to_json(self, filename=None):
+        """
+        Inputs:
+          filename - optional name of file to write the report to
+        Output:
+          Returns the report as a JSON string, also writing it to
+          filename if given.
+        """
+        text = json.dumps(self.report(), indent=2, sort_keys=True)
+        if filename is not None:
+            with open(filename, 'w') as jsonfile:
+                jsonfile.write(text + "\n")
+        return text